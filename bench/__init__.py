@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Benchmarks run with `python -m bench.<name>` from the repository root.
+# config.db reads DATABASE_URL on import, so pick the database before any
+# bench module imports it: a fresh SQLite file unless one is given.
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("CALLBACK_SECRET", "bench")
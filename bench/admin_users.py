@@ -0,0 +1,46 @@
+import argparse
+import time
+from config.db import get_db, query_totals
+from models.User import User
+from models.Wish import Wish
+from services.UserService import UserService
+from bench.dataset import populate
+
+# The admin "View All Users" report: the old per-user path (list users,
+# then load each user's wishes to count them) against the grouped query.
+#
+#   python -m bench.admin_users --users 10000 --wishes 100000
+
+def per_user_counts():
+    # What the report did before list_users_with_wish_counts existed
+    with get_db() as db:
+        users = db.query(User).all()
+    counts = []
+    for user in users:
+        with get_db() as db:
+            wishes = db.query(Wish).filter(Wish.user_id == user.id).all()
+        counts.append((user, len(wishes)))
+    return counts
+
+def measure(name, func):
+    queries = query_totals["count"]
+    started = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {len(rows)} users in {elapsed:.3f} s, {query_totals['count'] - queries} SQL statements")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user vs grouped wish counts")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--wishes", type=int, default=100_000)
+    args = parser.parse_args()
+
+    populate(args.users, args.wishes)
+    old = measure("per-user queries", per_user_counts)
+    new = measure("grouped query", UserService.list_users_with_wish_counts)
+    measure("grouped query, one page", lambda: UserService.list_users_with_wish_counts(limit=20))
+    assert [(u.id, n) for u, n in old] == [(u.id, n) for u, n in new], "counts differ"
+
+if __name__ == "__main__":
+    main()
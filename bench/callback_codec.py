@@ -0,0 +1,53 @@
+import argparse
+import timeit
+import bot
+
+# Cost of turning callback_data back into a handler call: the signed codec
+# plus dispatch table against the string prefixes it replaced.
+#
+#   python -m bench.callback_codec
+
+TELEGRAM_ID = 5_123_456_789
+WISH_ID, USER_ID = 1_234_567, 98_765
+
+def legacy_parse(data: str):
+    # The if/elif chain handle_callback used before the codec
+    if data.startswith("delete_"):
+        return "delete", int(data.split("_")[1])
+    elif data.startswith("confirm_"):
+        return "confirm", int(data.split("_")[1])
+    elif data == "cancel_delete":
+        return "cancel_delete", None
+    elif data.startswith("admin_delete_"):
+        return "admin_delete", int(data.split("_")[2])
+    elif data == "admin_cancel_delete":
+        return "admin_cancel", None
+    elif data.startswith("noop_"):
+        return "noop", None
+
+def dispatch(data: str):
+    action, args = bot.callbacks.decode(data, signer=TELEGRAM_ID)
+    handler, nargs = bot.CALLBACK_HANDLERS[action]
+    return handler, args
+
+def main():
+    parser = argparse.ArgumentParser(description="Callback data parse/dispatch microbenchmark")
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    confirm = bot.callbacks.encode(bot.CB_CONFIRM, WISH_ID, USER_ID, 0, signer=TELEGRAM_ID)
+    page = bot.callbacks.encode(bot.CB_PAGE, 1, bot.PAGE_NEXT, WISH_ID)
+    cases = {
+        "encode signed (confirm)": lambda: bot.callbacks.encode(bot.CB_CONFIRM, WISH_ID, USER_ID, 0, signer=TELEGRAM_ID),
+        "decode+dispatch signed (confirm)": lambda: dispatch(confirm),
+        "decode+dispatch unsigned (page)": lambda: dispatch(page),
+        "legacy prefix parse (confirm_)": lambda: legacy_parse(f"confirm_{WISH_ID}"),
+        "legacy prefix parse (admin_delete_)": lambda: legacy_parse(f"admin_delete_{TELEGRAM_ID}"),
+    }
+    print(f"confirm button: {len(confirm)} bytes, page button: {len(page)} bytes")
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f"{name}: {seconds / args.number * 1e6:.2f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import loadtest
+
+# Time to first update: from launching a webhook bot process (loadtest.py
+# --serve, which starts up like bot.py) until it has answered its first
+# update, both on an empty database, where the schema gets created, and on
+# one whose schema_version is already current.
+#
+#   python -m bench.cold_start --runs 5
+
+async def first_update(database_url: str):
+    # Returns (seconds until the process is ready, seconds until it has
+    # handled one update, its startup report)
+    import httpx
+
+    api = loadtest.FakeBotAPI()
+    waiters = loadtest.Waiters()
+    server = loadtest.FakeBotAPIServer(api, waiters)
+    await server.start()
+    port = loadtest._free_port()
+    env = dict(os.environ, DATABASE_URL=database_url)
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, loadtest.__file__, "--serve", str(port), "--api-url", server.url,
+        env=env, stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        while (await asyncio.wait_for(process.stdout.readline(), timeout=60)).strip() != b"ready":
+            if process.stdout.at_eof():
+                raise RuntimeError("bot process exited during startup")
+        ready = time.perf_counter() - started
+        data = loadtest.message_update(loadtest.FIRST_USER_ID, "/start")
+        done = waiters.expect(data["update_id"])
+        async with httpx.AsyncClient(timeout=30) as client:
+            await loadtest.post_update(client, f"http://127.0.0.1:{port}/telegram", data)
+        await asyncio.wait_for(done, timeout=60)
+        handled = time.perf_counter() - started
+    finally:
+        process.terminate()
+        output = (await process.stdout.read()).decode()
+        await process.wait()
+        server.stop()
+    report = [line for line in output.splitlines() if line.startswith("Startup:")]
+    return ready, handled, report[-1] if report else ""
+
+def summary(name, runs):
+    ready = statistics.median(r[0] for r in runs) * 1000
+    handled = statistics.median(r[1] for r in runs) * 1000
+    print(f"{name}: ready in {ready:.0f} ms, first update handled in {handled:.0f} ms (median of {len(runs)})")
+    print(f"  last run's own report: {runs[-1][2]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot process time to first update")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        database_url = f"sqlite:///{tempfile.mkdtemp()}/cold_start.db"
+        cold.append(asyncio.run(first_update(database_url)))
+        warm.append(asyncio.run(first_update(database_url)))
+    summary("empty database (schema created)", cold)
+    summary("current schema (schema checked)", warm)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import loadtest
+import metrics
+
+# Runs the same synthetic sessions one chat at a time and then with many
+# chats in flight, against a database slowed down to remote-server speeds.
+# With blocking calls on the event loop both runs would take equally long;
+# with the DB executor the concurrent one finishes several times faster.
+#
+#   python -m bench.concurrency --users 64 --db-latency 0.005
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs concurrent update handling")
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--wishes", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency", type=float, default=0.005, help="delay per SQL statement in seconds")
+    args = parser.parse_args()
+
+    loadtest.slow_database(args.db_latency)
+    elapsed = {}
+    for concurrency, first_user_id in ((1, 20_000_000), (args.concurrency, 30_000_000)):
+        print(f"── {concurrency} chat(s) at a time")
+        metrics.handler_stats.clear()
+        sessions = loadtest.synthetic_sessions(args.users, args.wishes, 0, first_user_id)
+        result = asyncio.run(loadtest.run(sessions, concurrency))
+        loadtest.report(result)
+        elapsed[concurrency] = result["elapsed"]
+    print(f"Speedup with {args.concurrency} chats in flight: {elapsed[1] / elapsed[args.concurrency]:.1f}x")
+
+if __name__ == "__main__":
+    main()
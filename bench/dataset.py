@@ -0,0 +1,42 @@
+import random
+from sqlalchemy import func, insert
+from config.db import engine, get_db, init_db
+from models.User import User
+from models.Wish import Wish
+from services.WishesService import text_hash
+
+WORDS = (
+    "bike book flowers perfume chocolate scarf headphones camera teapot candle "
+    "umbrella necklace puzzle backpack watch blanket vinyl plant notebook mug"
+).split()
+BATCH = 10_000
+
+def populate(users: int, wishes: int, seed: int = 8):
+    # Bulk-loads users and wishes spread across them with Core inserts,
+    # unless the database already holds at least that many
+    init_db()
+    with get_db() as db:
+        have_users = db.query(func.count(User.id)).scalar()
+        have_wishes = db.query(func.count(Wish.id)).scalar()
+    if have_users >= users and have_wishes >= wishes:
+        return
+
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for start in range(have_users, users, BATCH):
+            conn.execute(insert(User), [
+                {"telegram_id": 1_000_000_000 + n, "name": f"User {n}", "username": f"user{n}"}
+                for n in range(start, min(start + BATCH, users))
+            ])
+        first_user_id = conn.execute(func.min(User.id).select()).scalar()
+        for start in range(have_wishes, wishes, BATCH):
+            rows = []
+            for n in range(start, min(start + BATCH, wishes)):
+                text = f"{rng.choice(WORDS)} {rng.choice(WORDS)} #{n}"
+                rows.append({
+                    "user_id": first_user_id + n % users,
+                    "text": text,
+                    "priority": rng.randint(1, 10),
+                    "text_hash": text_hash(text),
+                })
+            conn.execute(insert(Wish), rows)
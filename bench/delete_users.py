@@ -0,0 +1,65 @@
+import argparse
+import time
+from sqlalchemy import delete
+from config.db import engine, get_db, init_db, query_totals
+from models.User import User
+from models.Wish import Wish
+from services.UserService import UserService
+from bench.dataset import populate
+
+# Deleting users who have thousands of wishes: the old path (load the user,
+# load their wishes through a second session, delete each one) against the
+# bulk DELETEs of UserService.delete_users. The ORM sends the old path's
+# per-wish DELETEs as one executemany, which counts as one statement here.
+#
+#   python -m bench.delete_users --wishes-per-user 5000
+
+FIRST_TELEGRAM_ID = 1_000_000_000  # the telegram_id of populate()'s first user
+BYSTANDERS = 10  # users left alone, so the DELETEs have rows to skip
+
+def old_delete_user(telegram_id):
+    # What delete_user did before delete_users existed
+    with get_db() as db:
+        user = db.query(User).filter(User.telegram_id == telegram_id).first()
+        if user:
+            db.delete(user)
+            with get_db() as other:  # get_wishes_by_user_id's own session
+                wishes = other.query(Wish).filter(Wish.user_id == user.id).all()
+            for wish in wishes:
+                db.delete(wish)
+            db.commit()
+        return user is not None
+
+def old_delete_users(telegram_ids):
+    return sum(old_delete_user(telegram_id) for telegram_id in telegram_ids)
+
+def reset(users, wishes_per_user):
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(delete(Wish))
+        conn.execute(delete(User))
+    populate(users, users * wishes_per_user)
+
+def measure(name, func, count, wishes_per_user):
+    reset(count + BYSTANDERS, wishes_per_user)
+    telegram_ids = [FIRST_TELEGRAM_ID + n for n in range(count)]
+    queries = query_totals["count"]
+    started = time.perf_counter()
+    deleted = func(telegram_ids)
+    elapsed = time.perf_counter() - started
+    assert deleted == count, f"{name}: deleted {deleted} of {count}"
+    print(f"  {name}: {elapsed * 1000:8.1f} ms, {query_totals['count'] - queries} SQL statements")
+
+def main():
+    parser = argparse.ArgumentParser(description="Old per-wish deletes vs bulk delete_users")
+    parser.add_argument("--wishes-per-user", type=int, default=5000)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 20], help="users deleted at once")
+    args = parser.parse_args()
+
+    for count in args.users:
+        print(f"{count} user{'s' if count != 1 else ''} with {args.wishes_per_user} wishes each ({engine.dialect.name})")
+        measure("per-wish deletes", old_delete_users, count, args.wishes_per_user)
+        measure("delete_users    ", UserService.delete_users, count, args.wishes_per_user)
+
+if __name__ == "__main__":
+    main()
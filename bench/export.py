@@ -0,0 +1,45 @@
+import argparse
+import tempfile
+import time
+import tracemalloc
+from bot import EXPORT_FORMATS, MAX_DOCUMENT_SIZE, _write_export
+from bench.dataset import populate
+
+# The admin /export at growing table sizes: time, compressed size, and the
+# peak Python memory of the streaming writer, which should not grow with
+# the number of rows.
+#
+#   python -m bench.export --sizes 100000 1000000
+
+def export(fmt: str, trace: bool):
+    with tempfile.TemporaryFile() as f:
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        count = _write_export(f, fmt)
+        elapsed = time.perf_counter() - started
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return count, elapsed, f.tell(), peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export time and memory by table size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000], help="wish counts")
+    args = parser.parse_args()
+
+    for size in sorted(args.sizes):
+        populate(max(size // 10, 1), size)
+        for fmt in EXPORT_FORMATS:
+            count, elapsed, compressed, _ = export(fmt, trace=False)
+            # tracemalloc slows the export down, so it gets a run of its own
+            _, _, _, peak = export(fmt, trace=True)
+            over = " (over the upload limit)" if compressed > MAX_DOCUMENT_SIZE else ""
+            print(
+                f"{size:>9} wishes, {fmt:4}: {count} rows in {elapsed:.1f} s, "
+                f"{compressed / 1024 / 1024:.1f} MB gzipped{over}, peak {peak / 1024 / 1024:.1f} MB"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from config.db import DB_WORKERS, get_db, init_db, pool_stats, run_db
+from models.User import User
+
+# Many concurrent get_db() sessions against the pool: first from more raw
+# threads than the pool has connections, then through run_db, whose
+# executor is sized to the pool. Pool counters are sampled while it runs.
+#
+#   python -m bench.pool_stress --threads 64 --sessions 2000 --hold 0.005
+#   DATABASE_URL=postgresql://... DB_POOL_SIZE=5 python -m bench.pool_stress
+
+def session(hold: float):
+    with get_db() as db:
+        db.query(func.count(User.id)).scalar()
+        # Stands in for the rest of a request's round trips
+        time.sleep(hold)
+
+class PoolSampler(threading.Thread):
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = {}
+        self.running = True
+
+    def run(self):
+        while self.running:
+            for name, value in pool_stats().items():
+                if name in ("checkedout", "overflow"):
+                    self.peak[name] = max(self.peak.get(name, value), value)
+            time.sleep(self.interval)
+
+def measure(name, runner, sessions: int):
+    before = pool_stats()
+    sampler = PoolSampler()
+    sampler.start()
+    started = time.perf_counter()
+    errors = runner()
+    elapsed = time.perf_counter() - started
+    sampler.running = False
+    after = pool_stats()
+    checkouts = after["checkouts"] - before["checkouts"]
+    waited = after["total_wait"] - before["total_wait"]
+    print(
+        f"{name}: {sessions} sessions in {elapsed:.2f} s ({sessions / elapsed:.0f}/s), {errors} errors, "
+        f"avg pool wait {waited / max(checkouts, 1) * 1000:.2f} ms, "
+        f"peak checked out {sampler.peak.get('checkedout', '?')}, peak overflow {sampler.peak.get('overflow', '?')}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent get_db() sessions against the connection pool")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--hold", type=float, default=0.005, help="seconds each session keeps its connection")
+    args = parser.parse_args()
+
+    init_db()
+
+    def threads():
+        errors = 0
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for future in [pool.submit(session, args.hold) for _ in range(args.sessions)]:
+                try:
+                    future.result()
+                except Exception:
+                    errors += 1
+        return errors
+
+    def executor():
+        async def go():
+            results = await asyncio.gather(
+                *(run_db(session, args.hold) for _ in range(args.sessions)), return_exceptions=True,
+            )
+            return sum(isinstance(result, Exception) for result in results)
+        return asyncio.run(go())
+
+    measure(f"{args.threads} raw threads", threads, args.sessions)
+    measure(f"run_db ({DB_WORKERS} workers)", executor, args.sessions)
+    print("Pool:", ", ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in pool_stats().items()))
+
+if __name__ == "__main__":
+    main()
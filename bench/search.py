@@ -0,0 +1,72 @@
+import argparse
+import random
+import statistics
+import time
+from sqlalchemy import func
+from config.db import engine, get_db
+from models.Wish import Wish
+from services.TrigramIndex import TrigramIndex
+from services.WishesService import WishesService
+from bench.dataset import WORDS, populate
+
+# Search latency as the wishes table grows: WishesService.search (the
+# pg_trgm index on Postgres, TrigramIndex on SQLite) against a plain
+# LIKE scan, over everyone's wishes and within one wishlist.
+#
+#   python -m bench.search --sizes 10000 100000 1000000
+
+def like_scan(query, user_id=None):
+    # What ranked search costs without an index: every row is read to find
+    # all the matches before the best can be picked
+    with get_db() as db:
+        q = db.query(func.count(Wish.id)).filter(Wish.text.ilike(f"%{query}%"))
+        if user_id is not None:
+            q = q.filter(Wish.user_id == user_id)
+        return q.scalar()
+
+def latencies(search, queries):
+    times = []
+    for query, user_id in queries:
+        started = time.perf_counter()
+        search(query, user_id=user_id)
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return f"p50 {statistics.median(times):7.2f} ms, p99 {times[int(len(times) * 0.99)]:7.2f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Wish search latency by table size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=20, help="LIKE scans per size; they are slow")
+    args = parser.parse_args()
+
+    rng = random.Random(18)
+    # Common words, shared by a twentieth of all wishes, including
+    # misspellings the trigram similarity still matches
+    common = WORDS + ["hedphones", "choclate", "umbrela"]
+    for size in sorted(args.sizes):
+        populate(max(size // 10, 1), size)
+        with get_db() as db:
+            first, last = db.query(func.min(Wish.user_id), func.max(Wish.user_id)).one()
+
+        def sample(count, per_user=False, rare=False):
+            return [
+                (f"#{rng.randrange(size)}" if rare else rng.choice(common), rng.randint(first, last) if per_user else None)
+                for _ in range(count)
+            ]
+
+        # Rebuild the in-process index for the new table size
+        WishesService.search_index = TrigramIndex()
+        started = time.perf_counter()
+        WishesService.search("warm up")
+        build = time.perf_counter() - started
+
+        print(f"{size:>9} wishes ({engine.dialect.name}, index built in {build:.1f} s)")
+        print(f"  search, common word:     {latencies(WishesService.search, sample(args.queries))}")
+        print(f"  search, rare term:       {latencies(WishesService.search, sample(args.queries, rare=True))}")
+        print(f"  search, one wishlist:    {latencies(WishesService.search, sample(args.queries, per_user=True))}")
+        print(f"  LIKE scan, common word:  {latencies(like_scan, sample(args.scan_queries))}")
+        print(f"  LIKE scan, rare term:    {latencies(like_scan, sample(args.scan_queries, rare=True))}")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,76 @@
-from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
+import time
+_process_started = time.perf_counter()
+
+from telegram import (
+    Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove,
+    InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent,
+)
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, ContextTypes,
-    MessageHandler, filters, ConversationHandler, CallbackQueryHandler
+    ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters,
+    ConversationHandler, CallbackQueryHandler, InlineQueryHandler, TypeHandler
 )
 from telegram.helpers import escape_markdown
+import asyncio
+import csv
+import hashlib
+import io
+import gzip
+import json
 import os
+import tempfile
 from dotenv import load_dotenv
-from config.db import init_db
+from config.db import init_db, pool_stats, query_totals, run_db
 from services.UserService import UserService
 from services.WishesService import WishesService
+from services.LRUCache import LRUCache, MISSING
+from services.CacheSyncService import CacheSyncService
+from update_processor import ChatUpdateProcessor
+from broadcast import Broadcaster, chat_bucket, global_bucket
+from persistence import DatabasePersistence
+from callback_codec import CallbackCodec, CallbackError
+from metrics import instrument_application, render_summary
 
-init_db()
 load_dotenv()
 
 TOKEN = os.getenv("TELEGRAM_TOKEN")
 
+# "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "32"))
+# Several replicas share one database (SHARED_STATE=1): conversation state is
+# re-read per update and cache invalidations are exchanged through the DB
+SHARED_STATE = CacheSyncService.enabled
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1"))
+# Seconds between batched writes of conversation state; 0 disables persistence
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "0.5" if SHARED_STATE else "5"))
+if SHARED_STATE and PERSISTENCE_INTERVAL <= 0:
+    raise RuntimeError("SHARED_STATE requires PERSISTENCE_INTERVAL > 0")
+# Signs callback buttons; defaults to a key derived from the bot token
+CALLBACK_SECRET = os.getenv("CALLBACK_SECRET") or hashlib.sha256(f"callback:{TOKEN}".encode()).hexdigest()
+
 # ── Conversation states ──────────────────────────────────────────────────────
 WAITING_FOR_NAME = 1
 WAITING_FOR_WISH = 2
 WAITING_FOR_PRIORITY = 3
 
+# ── Callback actions ─────────────────────────────────────────────────────────
+(
+    CB_NOOP, CB_DELETE, CB_CONFIRM, CB_CANCEL_DELETE,
+    CB_ADMIN_DELETE, CB_ADMIN_CANCEL, CB_PAGE, CB_WISH_PAGE,
+) = range(8)
+
+callbacks = CallbackCodec(
+    CALLBACK_SECRET.encode(),
+    signed={CB_DELETE, CB_CONFIRM, CB_CANCEL_DELETE, CB_ADMIN_DELETE, CB_WISH_PAGE},
+)
+
 # ── Keyboards ────────────────────────────────────────────────────────────────
-def main_menu(isAdmin=False):
+def _build_main_menu(isAdmin=False):
     rows = [
         ["🎁 My Wishes", "➕ Add Wish"],
         ["🔗 Share My List"],
@@ -30,7 +79,7 @@ def main_menu(isAdmin=False):
         rows.append(["🛠️ Admin Panel"])
     return ReplyKeyboardMarkup(rows, resize_keyboard=True, input_field_placeholder="Choose an option...")
 
-def admin_menu():
+def _build_admin_menu():
     return ReplyKeyboardMarkup(
         [
             ["👥 View All Users", "🎁 View All Wishes"],
@@ -41,45 +90,104 @@ def admin_menu():
         input_field_placeholder="Admin options...",
     )
 
-def priority_keyboard():
+def _build_priority_keyboard():
     rows = []
     nums = list(range(1, 11))
     for i in range(0, 10, 5):
         rows.append([str(n) for n in nums[i:i+5]])
     return ReplyKeyboardMarkup(rows, resize_keyboard=True, one_time_keyboard=True)
 
-def wishes_inline(wishes):
+# Telegram objects are immutable, so the static keyboards are built once
+_MAIN_MENUS = {False: _build_main_menu(False), True: _build_main_menu(True)}
+_ADMIN_MENU = _build_admin_menu()
+_PRIORITY_KEYBOARD = _build_priority_keyboard()
+
+def main_menu(isAdmin=False):
+    return _MAIN_MENUS[bool(isAdmin)]
+
+def admin_menu():
+    return _ADMIN_MENU
+
+def priority_keyboard():
+    return _PRIORITY_KEYBOARD
+
+def wishes_inline(wishes, telegram_id: int, user_id: int, page: int = 0, more: bool = False):
     buttons = []
     for w in wishes:
         label = f"[{w.priority}] {w.text}" if len(w.text) <= 30 else f"[{w.priority}] {w.text[:27]}…"
         buttons.append([
-            InlineKeyboardButton(f"📝 {label}", callback_data=f"noop_{w.id}"),
-            InlineKeyboardButton("❌", callback_data=f"delete_{w.id}"),
+            InlineKeyboardButton(f"📝 {label}", callback_data=callbacks.encode(CB_NOOP)),
+            InlineKeyboardButton("❌", callback_data=callbacks.encode(CB_DELETE, w.id, w.user_id, page, signer=telegram_id)),
         ])
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀", callback_data=callbacks.encode(CB_WISH_PAGE, user_id, page - 1, signer=telegram_id)))
+    if more:
+        nav.append(InlineKeyboardButton("▶", callback_data=callbacks.encode(CB_WISH_PAGE, user_id, page + 1, signer=telegram_id)))
+    if nav:
+        buttons.append(nav)
     return InlineKeyboardMarkup(buttons)
 
-def confirm_delete_inline(wish_id: int):
+def confirm_delete_inline(wish_id: int, user_id: int, page: int, telegram_id: int):
     return InlineKeyboardMarkup([[ 
-        InlineKeyboardButton("✅ Yes, delete", callback_data=f"confirm_{wish_id}"),
-        InlineKeyboardButton("🚫 Cancel", callback_data="cancel_delete"),
+        InlineKeyboardButton("✅ Yes, delete", callback_data=callbacks.encode(CB_CONFIRM, wish_id, user_id, page, signer=telegram_id)),
+        InlineKeyboardButton("🚫 Cancel", callback_data=callbacks.encode(CB_CANCEL_DELETE, user_id, page, signer=telegram_id)),
     ]])
 
-def admin_delete_user_inline(telegram_id: int):
+def admin_delete_user_inline(telegram_id: int, admin_telegram_id: int):
     return InlineKeyboardMarkup([[ 
-        InlineKeyboardButton("✅ Yes, delete user", callback_data=f"admin_delete_{telegram_id}"),
-        InlineKeyboardButton("🚫 Cancel", callback_data="admin_cancel_delete"),
+        InlineKeyboardButton("✅ Yes, delete user", callback_data=callbacks.encode(CB_ADMIN_DELETE, telegram_id, signer=admin_telegram_id)),
+        InlineKeyboardButton("🚫 Cancel", callback_data=callbacks.encode(CB_ADMIN_CANCEL)),
     ]])
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
-def _get_user(telegram_id: int):
-    return UserService.get_user_by_telegram_id(telegram_id)
+# Wishes per "My Wishes" message: two buttons each, well under Telegram's
+# limits on inline keyboards even after a large /import
+WISHLIST_PAGE_SIZE = 20
+
+# (user_id, telegram_id, page) -> (wishlist version, text, keyboard)
+_wishlist_renders = LRUCache(maxsize=int(os.getenv("RENDER_CACHE_SIZE", "1000")))
+
+async def _render_wishlist(user_id: int, telegram_id: int, page: int = 0):
+    # Read the version before the wishes so a concurrent change can only
+    # make this render look older than it is, never newer
+    version = WishesService.wishlist_version(user_id)
+    key = (user_id, telegram_id, page)
+    cached = _wishlist_renders.get(key)
+    if cached is not MISSING and cached[0] == version:
+        return cached[1], cached[2]
+
+    wishes = await run_db(
+        WishesService.get_wishes_by_user_id, user_id,
+        limit=WISHLIST_PAGE_SIZE + 1, offset=page * WISHLIST_PAGE_SIZE,
+    )
+    if not wishes and page > 0:
+        # The page emptied out, e.g. its last wish was deleted
+        return await _render_wishlist(user_id, telegram_id, page - 1)
+    if wishes:
+        more = len(wishes) > WISHLIST_PAGE_SIZE
+        wishes = wishes[:WISHLIST_PAGE_SIZE]
+        if page == 0 and not more:
+            count = f"{len(wishes)} item{'s' if len(wishes) != 1 else ''}"
+        else:
+            first = page * WISHLIST_PAGE_SIZE + 1
+            count = f"{first}–{first + len(wishes) - 1}"
+        text = f"🎁 *Your Wishlist* ({count})\n\nTap ❌ next to any wish to delete it:"
+        markup = wishes_inline(wishes, telegram_id, user_id, page, more)
+    else:
+        text, markup = None, None
+    _wishlist_renders.set(key, (version, text, markup))
+    return text, markup
+
+async def _get_user(telegram_id: int):
+    return await run_db(UserService.get_user_by_telegram_id, telegram_id)
 
 def _require_admin(user) -> bool:
     return user and user.isAdmin
 
 # ── /start ───────────────────────────────────────────────────────────────────
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    user = await _get_user(update.effective_user.id)
     if user:
         await update.message.reply_text(
             f"Welcome back, {user.name}! 👋\nWhat would you like to do?",
@@ -100,7 +208,7 @@ async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return WAITING_FOR_NAME
 
     tg = update.effective_user
-    user = UserService.get_or_create_user(tg.id, name, tg.username)
+    user = await run_db(UserService.get_or_create_user, tg.id, name, tg.username)
     await update.message.reply_text(
         f"Nice to meet you, {user.name}! ✅\n\nUse the menu below to manage your wishlist.",
         reply_markup=main_menu(isAdmin=user.isAdmin),
@@ -126,7 +234,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif text == "🗑️ Delete User":
         await admin_delete_user_start(update, context)
     elif text == "⬅️ Back to Main Menu":
-        user = _get_user(update.effective_user.id)
+        user = await _get_user(update.effective_user.id)
         await update.message.reply_text(
             "Back to main menu.",
             reply_markup=main_menu(isAdmin=user.isAdmin if user else False),
@@ -134,31 +242,24 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ── Show wishes (user) ───────────────────────────────────────────────────────
 async def show_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    user = await _get_user(update.effective_user.id)
     if not user:
         await update.message.reply_text("Please /start first.")
         return
 
-    wishes = WishesService.get_wishes_by_user_id(user.id)
-    if not wishes:
+    text, markup = await _render_wishlist(user.id, update.effective_user.id)
+    if not markup:
         await update.message.reply_text(
             "Your wishlist is empty! Tap ➕ Add Wish to get started.",
             reply_markup=main_menu(isAdmin=user.isAdmin),
         )
         return
 
-    # Sort by priority descending
-    wishes.sort(key=lambda x: x.priority, reverse=True)
-
-    await update.message.reply_text(
-        f"🎁 *Your Wishlist* ({len(wishes)} item{'s' if len(wishes) != 1 else ''})\n\nTap ❌ next to any wish to delete it:",
-        parse_mode="Markdown",
-        reply_markup=wishes_inline(wishes),
-    )
+    await update.message.reply_text(text, parse_mode="Markdown", reply_markup=markup)
 
 # ── Add wish flow ────────────────────────────────────────────────────────────
 async def add_wish_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    user = await _get_user(update.effective_user.id)
     if not user:
         await update.message.reply_text("Please /start first.")
         return ConversationHandler.END
@@ -201,98 +302,373 @@ async def add_wish_priority(update: Update, context: ContextTypes.DEFAULT_TYPE):
     is_admin = context.user_data["user_is_admin"]
     wish_text = context.user_data["wish_text"]
 
-    WishesService.create_wish(user_id, wish_text, priority)
+    wish, created = await run_db(WishesService.create_wish, user_id, wish_text, priority)
 
+    if created:
+        text = f"✅ Added:\n*{wish_text}*\nPriority: {priority}"
+    else:
+        text = f"ℹ️ Already on your list:\n*{wish.text}*\nPriority: {wish.priority}"
     await update.message.reply_text(
-        f"✅ Added:\n*{wish_text}*\nPriority: {priority}",
+        text,
         parse_mode="Markdown",
         reply_markup=main_menu(isAdmin=is_admin),
     )
     return ConversationHandler.END
 
+# ── Bulk import ──────────────────────────────────────────────────────────────
+MAX_IMPORT_WISHES = 1000
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+
+def _parse_import_rows(rows):
+    # rows: (line_no, text, priority-or-None); returns (items, errors)
+    items, errors = [], []
+    for line_no, text, priority in rows:
+        text = str(text).strip()
+        if not text:
+            errors.append(f"line {line_no}: empty wish")
+            continue
+        if priority is None or str(priority).strip() == "":
+            priority = 5
+        else:
+            # isdecimal, not isdigit: int() rejects digits like "²"
+            priority = str(priority).strip()
+            if not priority.isdecimal() or not 1 <= int(priority) <= 10:
+                errors.append(f"line {line_no}: priority must be 1–10")
+                continue
+            priority = int(priority)
+        items.append((text, priority))
+    return items, errors
+
+def _import_rows_from_text(text: str):
+    rows = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        wish_text, sep, priority = line.rpartition(";")
+        rows.append((line_no, wish_text, priority) if sep else (line_no, line, None))
+    return rows
+
+def _import_rows_from_csv(text: str):
+    first_line = text.split("\n", 1)[0]
+    reader = csv.reader(io.StringIO(text), delimiter=";" if ";" in first_line else ",")
+    return [
+        (line_no, row[0], row[1] if len(row) > 1 else None)
+        for line_no, row in enumerate(reader, start=1)
+        if row and any(cell.strip() for cell in row)
+        and not (line_no == 1 and row[0].strip().lower() == "text")  # header
+    ]
+
+def _import_rows_from_json(text: str):
+    entries = json.loads(text)
+    if not isinstance(entries, list):
+        raise ValueError("expected a JSON array")
+    rows = []
+    for line_no, entry in enumerate(entries, start=1):
+        if isinstance(entry, dict):
+            rows.append((line_no, entry.get("text", ""), entry.get("priority")))
+        elif isinstance(entry, list) and entry:
+            rows.append((line_no, entry[0], entry[1] if len(entry) > 1 else None))
+        else:
+            rows.append((line_no, entry, None))
+    return rows
+
+async def _import_wishes(update: Update, rows):
+    user = await _get_user(update.effective_user.id)
+    if not user:
+        await update.message.reply_text("Please /start first.")
+        return
+
+    items, errors = _parse_import_rows(rows)
+    if not items and not errors:
+        errors.append("nothing to import")
+    if len(items) > MAX_IMPORT_WISHES:
+        errors.append(f"at most {MAX_IMPORT_WISHES} wishes per import")
+    if errors:
+        shown = "\n".join(errors[:10]) + ("\n…" if len(errors) > 10 else "")
+        await update.message.reply_text(f"❌ Nothing imported:\n{shown}")
+        return
+
+    wishes = await run_db(WishesService.create_wishes, user.id, items)
+    skipped = len(items) - len(wishes)
+    await update.message.reply_text(
+        f"✅ Imported {len(wishes)} wish{'es' if len(wishes) != 1 else ''}."
+        + (f" Skipped {skipped} duplicate{'s' if skipped != 1 else ''}." if skipped else ""),
+        reply_markup=main_menu(isAdmin=user.isAdmin),
+    )
+
+async def import_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Everything after the command, including the rest of its own line,
+    # one "text;priority" per line
+    parts = update.message.text.split(maxsplit=1)
+    body = parts[1] if len(parts) > 1 else ""
+    if not body.strip():
+        await update.message.reply_text(
+            "Send /import followed by one wish per line as `text;priority`, "
+            "or upload a .csv/.json file.",
+            parse_mode="Markdown",
+        )
+        return
+    await _import_wishes(update, _import_rows_from_text(body))
+
+async def import_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    document = update.message.document
+    if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+        await update.message.reply_text("❌ File is too large (max 1 MB).")
+        return
+
+    file = await document.get_file()
+    content = bytes(await file.download_as_bytearray()).decode("utf-8-sig", errors="replace")
+    name = (document.file_name or "").lower()
+    try:
+        if name.endswith(".json"):
+            rows = _import_rows_from_json(content)
+        elif name.endswith(".csv"):
+            rows = _import_rows_from_csv(content)
+        else:
+            rows = _import_rows_from_text(content)
+    except (ValueError, TypeError, csv.Error):
+        await update.message.reply_text("❌ Couldn't read that file.")
+        return
+    await _import_wishes(update, rows)
+
+# ── /search <query> ──────────────────────────────────────────────────────────
+SEARCH_LIMIT = 20
+
+async def search_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = await _get_user(update.effective_user.id)
+    if not user:
+        await update.message.reply_text("Please /start first.")
+        return
+
+    parts = update.message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await update.message.reply_text("Usage: /search <text>")
+        return
+
+    # Admins search every wishlist, everyone else only their own
+    wishes = await run_db(
+        WishesService.search, parts[1], user_id=None if user.isAdmin else user.id, limit=SEARCH_LIMIT,
+    )
+    if not wishes:
+        await update.message.reply_text("🔎 No matching wishes.")
+        return
+
+    lines = []
+    for w in wishes:
+        owner = f" (user {w.user_id})" if user.isAdmin and w.user_id != user.id else ""
+        lines.append(f"• [{w.priority}] {w.text}{owner}")
+    await update.message.reply_text(f"🔎 Results for “{parts[1]}”\n\n" + "\n".join(lines)[:3900])
+
 # ── Share list ───────────────────────────────────────────────────────────────
 async def share_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    user = await _get_user(update.effective_user.id)
     if not user:
         await update.message.reply_text("Please /start first.")
         return
 
-    wishes = WishesService.get_wishes_by_user_id(user.id)
+    wishes = await run_db(WishesService.get_wishes_by_user_id, user.id)
     if not wishes:
         await update.message.reply_text("Your wishlist is empty — nothing to share yet!")
         return
 
-    wishes.sort(key=lambda x: x.priority, reverse=True)
-    lines = "\n".join(f"• [{w.priority}] {w.text}" for w in wishes)
+    intro = "Here's your shareable list — just forward this message!\n\n"
     await update.message.reply_text(
-        f"Here's your shareable list — just forward this message!\n\n🎁 *{user.name}'s Wishlist*\n\n{lines}",
+        intro + _share_text(user.name, wishes, MAX_MESSAGE_LENGTH - _message_length(intro)),
         parse_mode="Markdown",
         reply_markup=main_menu(isAdmin=user.isAdmin),
     )
 
+MAX_MESSAGE_LENGTH = 4096  # Telegram's limit, in UTF-16 code units
+
+def _message_length(text: str):
+    return len(text.encode("utf-16-le")) // 2
+
+def _share_text(name: str, wishes, max_length: int = MAX_MESSAGE_LENGTH):
+    # Sent with parse_mode="Markdown": a stray _ or * in a name or wish
+    # would otherwise make Telegram reject the message (or the whole
+    # inline answer), as would going over max_length. Wishes that don't
+    # fit are summed up in a last "…and N more" line.
+    text = f"🎁 *{escape_markdown(name)}'s Wishlist*\n"
+    budget = max_length - _message_length(text) - len(f"\n…and {len(wishes)} more")
+    lines = []
+    for w in wishes:
+        line = f"\n• \\[{w.priority}] {escape_markdown(w.text)}"
+        budget -= _message_length(line)
+        if budget < 0:
+            break
+        lines.append(line)
+    text += "".join(lines)
+    if len(lines) < len(wishes):
+        text += f"\n…and {len(wishes) - len(lines)} more"
+    return text
+
+# ── Inline sharing (@bot in any chat) ────────────────────────────────────────
+# How long Telegram may serve an answer without asking us again. It can't be
+# invalidated, so this bounds how stale a shared list can look after an edit.
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "30"))
+INLINE_MAX_RESULTS = 50  # Telegram's limit per answer
+
+# telegram_id -> (user_id, wishlist version, [(casefolded text, result), ...])
+_inline_snapshots = LRUCache(maxsize=int(os.getenv("INLINE_CACHE_SIZE", "1000")))
+
+def _build_inline_snapshot(user, wishes, version: int):
+    # Result ids carry the version, so clients never mix in results cached
+    # for an older list
+    entries = [("", InlineQueryResultArticle(
+        id=f"{version}:all",
+        title="🎁 Share my whole wishlist",
+        description=f"{len(wishes)} wish{'es' if len(wishes) != 1 else ''}",
+        input_message_content=InputTextMessageContent(_share_text(user.name, wishes), parse_mode="Markdown"),
+    ))]
+    for w in wishes[:INLINE_MAX_RESULTS - 1]:
+        entries.append((w.text.casefold(), InlineQueryResultArticle(
+            id=f"{version}:{w.id}",
+            title=w.text,
+            description=f"Priority {w.priority}",
+            input_message_content=InputTextMessageContent(f"🎁 {w.text}"),
+        )))
+    return entries
+
+async def inline_share(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.inline_query
+    user = await _get_user(query.from_user.id)
+    if not user:
+        await query.answer(
+            [], cache_time=0, is_personal=True,
+            button=InlineQueryResultsButton("🎁 Create your wishlist", start_parameter="inline"),
+        )
+        return
+
+    # Same versioning as _render_wishlist: unchanged lists cost no DB work
+    version = WishesService.wishlist_version(user.id)
+    snapshot = _inline_snapshots.get(query.from_user.id)
+    if snapshot is MISSING or snapshot[:2] != (user.id, version):
+        wishes = await run_db(WishesService.get_wishes_by_user_id, user.id)
+        snapshot = (user.id, version, _build_inline_snapshot(user, wishes, version) if wishes else [])
+        _inline_snapshots.set(query.from_user.id, snapshot)
+
+    entries = snapshot[2]
+    if not entries:
+        await query.answer(
+            [], cache_time=INLINE_CACHE_TIME, is_personal=True,
+            button=InlineQueryResultsButton("➕ Add your first wish", start_parameter="inline"),
+        )
+        return
+
+    needle = query.query.strip().casefold()
+    if needle:
+        results = [result for text, result in entries if needle in text]
+    else:
+        results = [result for _, result in entries]
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
 # ── Inline button callbacks ──────────────────────────────────────────────────
-async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    data = query.data
-
-    # ── User wish deletion ───────────────────────────────────────────────────
-    if data.startswith("delete_"):
-        wish_id = int(data.split("_")[1])
-        await query.edit_message_reply_markup(reply_markup=confirm_delete_inline(wish_id))
-
-    elif data.startswith("confirm_"):
-        wish_id = int(data.split("_")[1])
-        user = _get_user(query.from_user.id)
-        success = WishesService.delete_wish(wish_id, user.id)
-        if success:
-            wishes = WishesService.get_wishes_by_user_id(user.id)
-            wishes.sort(key=lambda x: x.priority, reverse=True)
-            if wishes:
-                await query.edit_message_text(
-                    f"✅ Wish deleted!\n\n🎁 *Your Wishlist* ({len(wishes)} item{'s' if len(wishes) != 1 else ''})\n\nTap ❌ next to any wish to delete it:",
-                    parse_mode="Markdown",
-                    reply_markup=wishes_inline(wishes),
-                )
-            else:
-                await query.edit_message_text("✅ Wish deleted!\n\nYour wishlist is now empty.")
-        else:
-            await query.edit_message_text("❌ Couldn't delete that wish.")
-
-    elif data == "cancel_delete":
-        user = _get_user(query.from_user.id)
-        wishes = WishesService.get_wishes_by_user_id(user.id)
-        wishes.sort(key=lambda x: x.priority, reverse=True)
-        await query.edit_message_reply_markup(reply_markup=wishes_inline(wishes))
-
-    # ── Admin user deletion ──────────────────────────────────────────────────
-    elif data.startswith("admin_delete_"):
-        telegram_id = int(data.split("_")[2])
-        actor = _get_user(query.from_user.id)
-        if not _require_admin(actor):
-            await query.answer("⛔ Access denied.", show_alert=True)
-            return
+# Signed callbacks carry the wish owner's user id, so none of the wish
+# handlers below need to look the user up again.
+async def _cb_delete(query, context, wish_id, user_id, page):
+    await query.edit_message_reply_markup(
+        reply_markup=confirm_delete_inline(wish_id, user_id, page, query.from_user.id)
+    )
 
-        target = _get_user(telegram_id)
-        target_name = target.name if target else str(telegram_id)
-        success = UserService.delete_user(telegram_id)
-        if success:
+async def _cb_confirm(query, context, wish_id, user_id, page):
+    success = await run_db(WishesService.delete_wish, wish_id, user_id)
+    if success:
+        text, markup = await _render_wishlist(user_id, query.from_user.id, page)
+        if markup:
             await query.edit_message_text(
-                f"✅ User *{target_name}* and all their wishes have been deleted.",
+                f"✅ Wish deleted!\n\n{text}",
                 parse_mode="Markdown",
+                reply_markup=markup,
             )
         else:
-            await query.edit_message_text("❌ User not found.")
+            await query.edit_message_text("✅ Wish deleted!\n\nYour wishlist is now empty.")
+    else:
+        await query.edit_message_text("❌ Couldn't delete that wish.")
+
+async def _cb_cancel_delete(query, context, user_id, page):
+    _, markup = await _render_wishlist(user_id, query.from_user.id, page)
+    await query.edit_message_reply_markup(reply_markup=markup)
+
+async def _cb_wish_page(query, context, user_id, page):
+    text, markup = await _render_wishlist(user_id, query.from_user.id, page)
+    if not markup:
+        await query.edit_message_text("Your wishlist is empty.")
+        return
+    await query.edit_message_text(text, parse_mode="Markdown", reply_markup=markup)
+
+async def _cb_admin_delete(query, context, telegram_id):
+    # Admin rights can be revoked after the button was sent, so re-check them
+    actor = await _get_user(query.from_user.id)
+    if not _require_admin(actor):
+        await query.answer("⛔ Access denied.", show_alert=True)
+        return
+
+    target = await _get_user(telegram_id)
+    target_name = target.name if target else str(telegram_id)
+    success = await run_db(UserService.delete_user, telegram_id)
+    if success:
+        await query.edit_message_text(
+            f"✅ User *{target_name}* and all their wishes have been deleted.",
+            parse_mode="Markdown",
+        )
+    else:
+        await query.edit_message_text("❌ User not found.")
+
+async def _cb_admin_cancel(query, context):
+    await query.edit_message_text("Deletion cancelled.")
 
-    elif data == "admin_cancel_delete":
-        await query.edit_message_text("Deletion cancelled.")
+async def _cb_page(query, context, view, direction, cursor):
+    actor = await _get_user(query.from_user.id)
+    if not _require_admin(actor) or not 0 <= view < len(ADMIN_VIEWS):
+        await query.answer("⛔ Access denied.", show_alert=True)
+        return
+
+    render, empty_text = ADMIN_PAGES[ADMIN_VIEWS[view]]
+    page = await render(
+        after_id=cursor if direction == PAGE_NEXT else None,
+        before_id=cursor if direction == PAGE_PREV else None,
+        actor_telegram_id=query.from_user.id,
+    )
+    if not page:
+        await query.edit_message_text(empty_text)
+        return
+
+    text, parse_mode, markup = page
+    await query.edit_message_text(text, parse_mode=parse_mode, reply_markup=markup)
+
+async def _cb_noop(query, context):
+    pass
+
+# action -> (handler, number of packed arguments)
+CALLBACK_HANDLERS = {
+    CB_NOOP: (_cb_noop, 0),
+    CB_DELETE: (_cb_delete, 3),
+    CB_CONFIRM: (_cb_confirm, 3),
+    CB_CANCEL_DELETE: (_cb_cancel_delete, 2),
+    CB_ADMIN_DELETE: (_cb_admin_delete, 1),
+    CB_ADMIN_CANCEL: (_cb_admin_cancel, 0),
+    CB_PAGE: (_cb_page, 3),
+    CB_WISH_PAGE: (_cb_wish_page, 2),
+}
+
+async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        action, args = callbacks.decode(query.data, signer=query.from_user.id)
+        handler, nargs = CALLBACK_HANDLERS[action]
+    except (CallbackError, KeyError):
+        handler, nargs = None, None
+    if handler is None or len(args) != nargs:
+        # Forged, or sent before a format change
+        await query.answer("This button has expired.", show_alert=True)
+        return
 
-    elif data.startswith("noop_"):
-        pass
+    await query.answer()
+    await handler(query, context, *args)
 
 # ── Admin panel ──────────────────────────────────────────────────────────────
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    user = await _get_user(update.effective_user.id)
     if not _require_admin(user):
         await update.message.reply_text("⛔ You don't have access to the admin panel.")
         return
@@ -305,27 +681,45 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ── /cancel ──────────────────────────────────────────────────────────────────
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    user = await _get_user(update.effective_user.id)
     await update.message.reply_text(
         "Cancelled. 👍",
         reply_markup=main_menu(isAdmin=user.isAdmin if user else False),
     )
     return ConversationHandler.END
 
-async def admin_view_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
-    if not _require_admin(user):
-        await update.message.reply_text("⛔ Access denied.")
-        return
-
-    users = UserService.list_users()
+# ── Admin listings (keyset-paginated) ────────────────────────────────────────
+ADMIN_PAGE_SIZE = 20
+ADMIN_VIEWS = ("users", "wishes", "deluser")
+PAGE_PREV, PAGE_NEXT = 0, 1
+
+async def _fetch_page(view, fetch, key, after_id=None, before_id=None, **kwargs):
+    # One extra row tells us whether there is another page in that direction
+    rows = await run_db(fetch, after_id=after_id, before_id=before_id, limit=ADMIN_PAGE_SIZE + 1, **kwargs)
+    more = len(rows) > ADMIN_PAGE_SIZE
+    if before_id is not None:
+        rows = rows[-ADMIN_PAGE_SIZE:]
+        has_prev, has_next = more, True
+    else:
+        rows = rows[:ADMIN_PAGE_SIZE]
+        has_prev, has_next = after_id is not None, more
+    view = ADMIN_VIEWS.index(view)
+    nav = []
+    if rows and has_prev:
+        nav.append(InlineKeyboardButton("◀", callback_data=callbacks.encode(CB_PAGE, view, PAGE_PREV, key(rows[0]))))
+    if rows and has_next:
+        nav.append(InlineKeyboardButton("▶", callback_data=callbacks.encode(CB_PAGE, view, PAGE_NEXT, key(rows[-1]))))
+    return rows, nav
+
+async def _users_page(after_id=None, before_id=None, actor_telegram_id=None):
+    users, nav = await _fetch_page(
+        "users", UserService.list_users_with_wish_counts, lambda r: r[0].id, after_id, before_id,
+    )
     if not users:
-        await update.message.reply_text("No users found.", reply_markup=admin_menu())
-        return
+        return None
 
     lines = []
-    for u in users:
-        wishes = WishesService.get_wishes_by_user_id(u.id)
+    for u, wish_count in users:
         admin_badge = " 👑" if u.isAdmin else ""
         username_str = f"@{u.username}" if u.username else "no username"
 
@@ -334,77 +728,321 @@ async def admin_view_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         lines.append(
             f"• *{name_safe}*{admin_badge} \\({username_safe}\\)\n"
-            f"  📋 {len(wishes)} wish{'es' if len(wishes) != 1 else ''} \\| ID: `{u.telegram_id}`"
+            f"  📋 {wish_count} wish{'es' if wish_count != 1 else ''} \\| ID: `{u.telegram_id}`"
         )
 
-    message_text = f"👥 *All Users* \\({len(users)} total\\)\n\n" + "\n\n".join(lines)
+    message_text = "👥 *All Users*\n\n" + "\n\n".join(lines)
+    return message_text, "MarkdownV2", InlineKeyboardMarkup([nav]) if nav else None
 
-    await update.message.reply_text(
-        message_text,
-        parse_mode="MarkdownV2",
-        reply_markup=admin_menu(),
+async def _wishes_page(after_id=None, before_id=None, actor_telegram_id=None):
+    rows, nav = await _fetch_page(
+        "wishes", WishesService.list_wishes_with_owners, lambda r: r[0].id, after_id, before_id,
     )
+    if not rows:
+        return None
 
-async def admin_view_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    # Group consecutive wishes by owner
+    lines = []
+    last_uid = None
+    for w, owner_name in rows:
+        if w.user_id != last_uid:
+            lines.append(f"👤 {owner_name or f'User {w.user_id}'}")
+            last_uid = w.user_id
+        text = w.text if len(w.text) <= 150 else f"{w.text[:147]}…"
+        lines.append(f"  • {text} (Priority: {w.priority})")
+
+    full_message = "🎁 All Wishes\n\n" + "\n".join(lines)
+    return full_message, None, InlineKeyboardMarkup([nav]) if nav else None
+
+async def _delete_users_page(after_id=None, before_id=None, actor_telegram_id=None):
+    # Prevent admin from deleting themselves
+    users, nav = await _fetch_page(
+        "deluser", UserService.list_users, lambda u: u.id, after_id, before_id,
+        exclude_telegram_id=actor_telegram_id,
+    )
+    if not users:
+        return None
+
+    buttons = []
+    for u in users:
+        label = f"{'👑 ' if u.isAdmin else ''}{u.name}"
+        if u.username:
+            label += f" (@{u.username})"
+        buttons.append([InlineKeyboardButton(
+            label, callback_data=callbacks.encode(CB_ADMIN_DELETE, u.telegram_id, signer=actor_telegram_id),
+        )])
+    if nav:
+        buttons.append(nav)
+
+    return (
+        "🗑️ *Delete User*\n\nSelect a user to delete.\n⚠️ This will also delete all their wishes.",
+        "Markdown",
+        InlineKeyboardMarkup(buttons),
+    )
+
+ADMIN_PAGES = {
+    "users": (_users_page, "No users found."),
+    "wishes": (_wishes_page, "No wishes found."),
+    "deluser": (_delete_users_page, "No other users to delete."),
+}
+
+async def _send_admin_page(update: Update, view: str):
+    user = await _get_user(update.effective_user.id)
     if not _require_admin(user):
         await update.message.reply_text("⛔ Access denied.")
         return
 
-    all_wishes = WishesService.list_all_wishes()
-    if not all_wishes:
-        await update.message.reply_text("No wishes found.", reply_markup=admin_menu())
+    render, empty_text = ADMIN_PAGES[view]
+    page = await render(actor_telegram_id=update.effective_user.id)
+    if not page:
+        await update.message.reply_text(empty_text, reply_markup=admin_menu())
         return
 
-    # Group wishes by user_id
-    users = {u.id: u for u in UserService.list_users()}
-    grouped: dict = {}
-    for w in all_wishes:
-        grouped.setdefault(w.user_id, []).append(w)
+    text, parse_mode, markup = page
+    await update.message.reply_text(text, parse_mode=parse_mode, reply_markup=markup)
 
-    lines = []
-    for uid, wishes in grouped.items():
-        u = users.get(uid)
-        owner = u.name if u else f"User {uid}"
-        lines.append(f"👤 {owner}")
-        
-        for w in wishes:
-            lines.append(f"  • {w.text} (Priority: {w.priority})")
-
-    full_message = f"🎁 All Wishes ({len(all_wishes)} total)\n\n" + "\n".join(lines)
+async def admin_view_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _send_admin_page(update, "users")
 
-    await update.message.reply_text(full_message, reply_markup=admin_menu())
+async def admin_view_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _send_admin_page(update, "wishes")
 
 async def admin_delete_user_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = _get_user(update.effective_user.id)
+    await _send_admin_page(update, "deluser")
+
+# ── /deleteusers <telegram_id> ... ───────────────────────────────────────────
+async def admin_delete_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = await _get_user(update.effective_user.id)
     if not _require_admin(user):
         await update.message.reply_text("⛔ Access denied.")
         return
 
-    users = UserService.list_users()
+    if not context.args or not all(arg.isdigit() for arg in context.args):
+        await update.message.reply_text("Usage: /deleteusers <telegram_id> [<telegram_id> ...]")
+        return
+
     # Prevent admin from deleting themselves
-    deletable = [u for u in users if u.telegram_id != update.effective_user.id]
+    telegram_ids = {int(arg) for arg in context.args} - {update.effective_user.id}
+    deleted = await run_db(UserService.delete_users, list(telegram_ids))
+    await update.message.reply_text(
+        f"✅ Deleted {deleted} user{'s' if deleted != 1 else ''} and all their wishes.",
+        reply_markup=admin_menu(),
+    )
+
+# ── /broadcast <text> ────────────────────────────────────────────────────────
+BROADCAST_CHUNK = 500
+
+async def _broadcast_recipients():
+    # Keyset-paginate through users so only one chunk is in memory at a time
+    after_id = None
+    while True:
+        users = await run_db(UserService.list_users, after_id=after_id, limit=BROADCAST_CHUNK)
+        for u in users:
+            yield u.telegram_id
+        if len(users) < BROADCAST_CHUNK:
+            return
+        after_id = users[-1].id
 
-    if not deletable:
-        await update.message.reply_text("No other users to delete.", reply_markup=admin_menu())
+async def _edit_status(status, text: str):
+    # The status message is edited over and over, so it is the one chat
+    # that needs the per-chat limit; the edits count toward the global one.
+    await chat_bucket(status.chat_id).acquire()
+    await global_bucket().acquire()
+    await status.edit_text(text)
+
+async def _run_broadcast(bot, text: str, status):
+    async def report(sent, failed):
+        await _edit_status(status, f"📣 Broadcasting… {sent} sent, {failed} failed")
+
+    sent, failed = await Broadcaster(bot).run(_broadcast_recipients(), text, on_progress=report)
+    await _edit_status(status, f"📣 Broadcast finished: {sent} sent, {failed} failed.")
+
+async def admin_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = await _get_user(update.effective_user.id)
+    if not _require_admin(user):
+        await update.message.reply_text("⛔ Access denied.")
         return
 
-    buttons = []
-    for u in deletable:
-        label = f"{'👑 ' if u.isAdmin else ''}{u.name}"
-        if u.username:
-            label += f" (@{u.username})"
-        buttons.append([InlineKeyboardButton(label, callback_data=f"admin_delete_{u.telegram_id}")])
+    parts = update.message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await update.message.reply_text("Usage: /broadcast <message>")
+        return
 
-    await update.message.reply_text(
-        "🗑️ *Delete User*\n\nSelect a user to delete.\n⚠️ This will also delete all their wishes.",
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(buttons),
-    )
+    status = await update.message.reply_text("📣 Broadcast started…")
+    context.application.create_task(_run_broadcast(context.bot, parts[1], status), update=update)
+
+# ── /export [csv|json] ──────────────────────────────────────────────────────
+EXPORT_BATCH = 1000
+EXPORT_FORMATS = {"csv": "csv", "json": "ndjson"}  # format -> file extension
+EXPORT_FIELDS = ("user_id", "telegram_id", "name", "username", "is_admin", "wish_id", "wish", "priority")
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024  # Bot API upload limit
+
+def _write_export(fileobj, fmt: str):
+    # Runs on a DB worker thread. Rows go from the cursor straight into the
+    # gzip stream, so memory use doesn't grow with the tables.
+    rows = UserService.stream_users_with_wishes(EXPORT_BATCH)
+    count = 0
+    # Level 6 compresses nearly as well as gzip's default 9 in a fraction of the time
+    gz = gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6)
+    with io.TextIOWrapper(gz, encoding="utf-8", newline="") as out:
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_FIELDS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            for row in rows:
+                out.write(encode(dict(zip(EXPORT_FIELDS, row))) + "\n")
+                count += 1
+    return count
+
+async def _run_export(message, fmt: str, status):
+    # Spooled to disk rather than memory; only the compressed file is read
+    # back in full, when it is uploaded
+    try:
+        with tempfile.TemporaryFile() as f:
+            count = await run_db(_write_export, f, fmt)
+            size = f.tell()
+            if size > MAX_DOCUMENT_SIZE:
+                await status.edit_text(f"❌ The export is {size / 1024 / 1024:.0f} MB, over Telegram's 50 MB limit.")
+                return
+            f.seek(0)
+            await message.reply_document(
+                f,
+                filename=f"wishlist-export-{time.strftime('%Y%m%d-%H%M%S')}.{EXPORT_FORMATS[fmt]}.gz",
+                reply_markup=admin_menu(),
+            )
+    except Exception as exc:
+        # e.g. the database dropped the cursor mid-stream, or the upload
+        # failed; don't leave the status at "started"
+        print(f"Export failed: {exc!r}")
+        await status.edit_text("❌ Export failed, please try again.")
+        return
+    await status.edit_text(f"📦 Export finished: {count} row{'s' if count != 1 else ''}.")
+
+async def admin_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = await _get_user(update.effective_user.id)
+    if not _require_admin(user):
+        await update.message.reply_text("⛔ Access denied.")
+        return
+
+    fmt = context.args[0].lower() if context.args else "csv"
+    if len(context.args) > 1 or fmt not in EXPORT_FORMATS:
+        await update.message.reply_text("Usage: /export [csv|json]")
+        return
+
+    status = await update.message.reply_text("📦 Export started…")
+    context.application.create_task(_run_export(update.message, fmt, status), update=update)
+
+# ── /stats ───────────────────────────────────────────────────────────────────
+async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = await _get_user(update.effective_user.id)
+    if not _require_admin(user):
+        await update.message.reply_text("⛔ Access denied.")
+        return
+
+    def fmt(stats):
+        return ", ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in stats.items())
+
+    processor = context.application.update_processor
+    sections = [
+        "📊 Handlers\n" + (render_summary() or "no updates yet"),
+        f"🗄️ SQL: {query_totals['count']} statements, {query_totals['time']:.3f}s total",
+        f"🔌 Pool: {fmt(pool_stats())}",
+        f"👤 User cache: {fmt(UserService.user_cache.stats())}",
+        f"🎁 Wish cache: {fmt(WishesService.wish_cache.stats())}",
+    ]
+    if isinstance(processor, ChatUpdateProcessor):
+        sections.append(f"📥 Updates: {fmt(processor.stats())}")
+
+    # Stay under Telegram's 4096-character message limit
+    await update.message.reply_text("\n\n".join(sections)[:4096])
+
+# ── Background tasks ─────────────────────────────────────────────────────────
+PRUNE_EVERY = 60  # sync ticks between cache_events pruning runs
+DEDUPE_BATCH = 500
+DEDUPE_PAUSE = 0.5  # seconds between dedupe batches, to leave room for live traffic
+DEDUPE_RETRY = 5  # seconds before running a failed dedupe batch again
+
+async def _sync_caches():
+    await run_db(CacheSyncService.start_sync)
+    ticks = 0
+    while True:
+        await asyncio.sleep(CACHE_SYNC_INTERVAL)
+        try:
+            await run_db(CacheSyncService.apply_remote_events)
+            ticks += 1
+            if ticks % PRUNE_EVERY == 0:
+                await run_db(CacheSyncService.prune_events)
+        except Exception as exc:
+            print(f"Cache sync failed: {exc!r}")
+
+async def _dedupe_wishes():
+    # Backfill text hashes / drop duplicates left from before idempotent creates
+    while True:
+        try:
+            if not await run_db(WishesService.dedupe_batch, DEDUPE_BATCH):
+                return
+        except Exception as exc:
+            # e.g. an IntegrityError when a live create raced the batch;
+            # the batch rolled back, so it's safe to run again
+            print(f"Wish dedupe failed, retrying: {exc!r}")
+            await asyncio.sleep(DEDUPE_RETRY)
+            continue
+        await asyncio.sleep(DEDUPE_PAUSE)
+
+_background_tasks = []
+
+async def _start_background_tasks(app):
+    _startup_times["connected to Telegram"] = time.perf_counter()
+    _report_startup()
+    _background_tasks.append(asyncio.create_task(_dedupe_wishes()))
+    if SHARED_STATE:
+        _background_tasks.append(asyncio.create_task(_sync_caches()))
+
+async def _stop_background_tasks(app):
+    for task in _background_tasks:
+        task.cancel()
+
+# ── Startup timing ───────────────────────────────────────────────────────────
+# Stage name -> perf_counter() when it finished, in order
+_startup_times = {}
+
+def _report_startup():
+    previous = _process_started
+    parts = []
+    for stage, finished in _startup_times.items():
+        parts.append(f"{stage} {(finished - previous) * 1000:.0f} ms")
+        previous = finished
+    total = (previous - _process_started) * 1000
+    print(f"Startup: {', '.join(parts)} (total {total:.0f} ms)")
+
+async def _first_update(update: object, context: ContextTypes.DEFAULT_TYPE):
+    if "first update" not in _startup_times:
+        _startup_times["first update"] = time.perf_counter()
+        _report_startup()
 
 # ── App setup ────────────────────────────────────────────────────────────────
-if __name__ == "__main__":
-    app = ApplicationBuilder().token(TOKEN).build()
+def build_application(token: str, request=None, base_url: str = None):
+    # `request` replaces the HTTP client used to reach the Bot API and
+    # `base_url` the Bot API server (see loadtest.py)
+    persistence = None
+    processor = ChatUpdateProcessor(MAX_CONCURRENT_UPDATES)
+    builder = ApplicationBuilder().token(token).concurrent_updates(processor)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    if base_url is not None:
+        builder = builder.base_url(base_url)
+    if PERSISTENCE_INTERVAL > 0:
+        persistence = DatabasePersistence(update_interval=PERSISTENCE_INTERVAL, shared=SHARED_STATE)
+        builder = builder.persistence(persistence)
+    if SHARED_STATE and persistence is not None:
+        processor.before_update = persistence.load_chat_state
+        processor.after_update = persistence.save_chat_state
+    builder = builder.post_init(_start_background_tasks).post_shutdown(_stop_background_tasks)
+    app = builder.build()
 
     registration_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -412,6 +1050,8 @@ if __name__ == "__main__":
             WAITING_FOR_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, register)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        name="registration",
+        persistent=persistence is not None,
     )
 
     add_wish_handler = ConversationHandler(
@@ -424,10 +1064,18 @@ if __name__ == "__main__":
             WAITING_FOR_PRIORITY: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_wish_priority)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        name="add_wish",
+        persistent=persistence is not None,
     )
 
     app.add_handler(registration_handler)
     app.add_handler(add_wish_handler)
+    if persistence is not None:
+        persistence.conversation_handlers = {
+            "registration": registration_handler,
+            "add_wish": add_wish_handler,
+        }
+        persistence.user_data = app.user_data
 
     app.add_handler(MessageHandler(
         filters.Regex("^(👥 View All Users|🎁 View All Wishes|🗑️ Delete User|⬅️ Back to Main Menu)$"),
@@ -440,11 +1088,48 @@ if __name__ == "__main__":
     ))
 
     app.add_handler(CallbackQueryHandler(handle_callback))
+    app.add_handler(InlineQueryHandler(inline_share))
 
     # Convenience commands
     app.add_handler(CommandHandler("mywishes", show_wishes))
     app.add_handler(CommandHandler("share", share_list))
     app.add_handler(CommandHandler("admin", admin_panel))
+    app.add_handler(CommandHandler("deleteusers", admin_delete_users))
+    app.add_handler(CommandHandler("stats", admin_stats))
+    app.add_handler(CommandHandler("broadcast", admin_broadcast))
+    app.add_handler(CommandHandler("export", admin_export))
+    app.add_handler(CommandHandler("search", search_wishes))
+    app.add_handler(CommandHandler("import", import_text))
+    app.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("json")
+        | filters.Document.FileExtension("txt"),
+        import_file,
+    ))
+
+    instrument_application(app)
+    app.add_handler(TypeHandler(Update, _first_update), group=-1)
+    return app
 
-    print("Bot is running...")
-    app.run_polling()
\ No newline at end of file
+if __name__ == "__main__":
+    _startup_times["imports"] = time.perf_counter()
+    schema_synced = init_db()
+    _startup_times["schema sync" if schema_synced else "schema check"] = time.perf_counter()
+
+    app = build_application(TOKEN)
+    _startup_times["application setup"] = time.perf_counter()
+
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL must be set when BOT_MODE=webhook")
+        print(f"Bot is running (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        print("Bot is running...")
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+
+# Telegram allows ~30 messages/s overall and ~1 message/s to the same chat
+GLOBAL_RATE = 30
+PER_CHAT_RATE = 1
+MAX_RETRIES = 3
+RETRY_DELAY = 1.0  # seconds before retrying a timeout, doubled each time
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        # After a RetryAfter, nobody may send until the flood wait is over
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+# Telegram's limits are per bot token, not per broadcast, so every
+# Broadcaster in the process draws from the same global bucket, and each
+# chat has one bucket however many tasks write to it.
+_global_bucket = None
+_chat_buckets = {}
+
+def global_bucket() -> TokenBucket:
+    global _global_bucket
+    if _global_bucket is None:
+        _global_bucket = TokenBucket(GLOBAL_RATE)
+    return _global_bucket
+
+def chat_bucket(chat_id: int) -> TokenBucket:
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        bucket = _chat_buckets[chat_id] = TokenBucket(PER_CHAT_RATE)
+    return bucket
+
+# Streams recipients into a bounded queue and sends to them from a few
+# workers, honouring the global limit and Telegram's RetryAfter. Each
+# recipient gets a single message, so the per-chat limit only matters for
+# the chat showing progress. `recipients` is an async iterator of chat ids;
+# `on_progress` is awaited with (sent, failed) every `progress_every`
+# messages, and a failing callback is logged without stopping the broadcast.
+class Broadcaster:
+    def __init__(self, bot, workers: int = 8, bucket: TokenBucket = None):
+        self.bot = bot
+        self.workers = workers
+        self.global_bucket = bucket or global_bucket()
+        self.sent = 0
+        self.failed = 0
+
+    async def _send(self, chat_id: int, text: str):
+        for attempt in range(MAX_RETRIES):
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id, text)
+                self.sent += 1
+                return
+            except RetryAfter as exc:
+                self.global_bucket.pause(exc.retry_after)
+                await asyncio.sleep(exc.retry_after)
+            except BadRequest:
+                # A NetworkError subclass, but resending won't fix it
+                break
+            except NetworkError:
+                # TimedOut or a dropped connection; usually transient
+                await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+            except TelegramError:
+                # Forbidden (the user blocked the bot) and other refusals
+                break
+        self.failed += 1
+
+    async def run(self, recipients, text: str, on_progress=None, progress_every: int = 100):
+        queue = asyncio.Queue(maxsize=self.workers * 4)
+
+        async def worker():
+            while True:
+                chat_id = await queue.get()
+                try:
+                    if chat_id is None:
+                        return
+                    await self._send(chat_id, text)
+                    done = self.sent + self.failed
+                    if on_progress and done % progress_every == 0:
+                        try:
+                            await on_progress(self.sent, self.failed)
+                        except Exception as exc:
+                            print(f"Broadcast progress update failed: {exc!r}")
+                finally:
+                    queue.task_done()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            async for chat_id in recipients:
+                await queue.put(chat_id)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.sent, self.failed
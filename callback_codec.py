@@ -0,0 +1,73 @@
+import base64
+import hmac
+
+# Telegram rejects callback_data longer than this many bytes
+MAX_CALLBACK_DATA = 64
+VERSION = 1
+SIGNATURE_SIZE = 8
+
+class CallbackError(ValueError):
+    pass
+
+def _write_varint(value: int) -> bytes:
+    # Zigzag so negative ids (group chats) stay short too
+    value = (value << 1) ^ (value >> 63)
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _read_varints(raw: bytes):
+    values, value, shift = [], 0, 0
+    for byte in raw:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append((value >> 1) ^ -(value & 1))
+            value, shift = 0, 0
+    if shift:
+        raise CallbackError("truncated callback payload")
+    return values
+
+# Packs an action code and integer arguments into
+# base64url(version, action, varint args..., [hmac]).
+# Actions listed in `signed` carry a truncated HMAC bound to the Telegram user
+# the button was rendered for, so handlers can trust their arguments (e.g.
+# which user owns a wish) without re-reading the database.
+class CallbackCodec:
+    def __init__(self, secret: bytes, signed=()):
+        self._secret = secret
+        self._signed = frozenset(signed)
+
+    def _sign(self, body: bytes, signer: int) -> bytes:
+        message = body + _write_varint(signer)
+        return hmac.digest(self._secret, message, "sha256")[:SIGNATURE_SIZE]
+
+    def encode(self, action: int, *args: int, signer: int = None) -> str:
+        body = bytes((VERSION, action)) + b"".join(_write_varint(arg) for arg in args)
+        if action in self._signed:
+            if signer is None:
+                raise ValueError(f"action {action} must be signed")
+            body += self._sign(body, signer)
+        data = base64.urlsafe_b64encode(body).rstrip(b"=").decode("ascii")
+        if len(data) > MAX_CALLBACK_DATA:
+            raise ValueError(f"callback data is {len(data)} bytes, limit is {MAX_CALLBACK_DATA}")
+        return data
+
+    def decode(self, data: str, signer: int = None):
+        try:
+            raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+        except (ValueError, TypeError):
+            raise CallbackError("malformed callback data")
+        if len(raw) < 2 or raw[0] != VERSION:
+            raise CallbackError("unknown callback version")
+
+        action, payload = raw[1], raw[2:]
+        if action in self._signed:
+            payload, signature = payload[:-SIGNATURE_SIZE], payload[-SIGNATURE_SIZE:]
+            expected = self._sign(raw[:2] + payload, signer if signer is not None else 0)
+            if len(signature) != SIGNATURE_SIZE or not hmac.compare_digest(signature, expected):
+                raise CallbackError("bad callback signature")
+        return action, _read_varints(payload)
@@ -0,0 +1,544 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from telegram.request import BaseRequest
+
+# Drives bot.py's handlers offline: updates are fed straight into the
+# application and every Bot API call is answered by FakeBotAPI below, so
+# only our own code and the database are measured.
+#
+#   python loadtest.py --users 200 --wishes 5
+#   python loadtest.py --users 50 --record updates.jsonl
+#   python loadtest.py --replay updates.jsonl
+#   python loadtest.py --db-latency 0.01   # as if the database were remote
+#   python loadtest.py --webhook 8443 --replay updates.jsonl
+#   python loadtest.py --workers 3
+#
+# --webhook sends every update through the HTTP server run_webhook uses,
+# secret token included, rather than handing it to the application.
+# --workers N starts N such bot processes on one database instead, with
+# SHARED_STATE=1, and serves them the fake Bot API over HTTP.
+# DATABASE_URL picks the database (a fresh SQLite file by default). Replays
+# should start from the same database state the updates were recorded on,
+# since callbacks carry wish ids; admin rights granted by the synthetic run
+# are not part of the recording.
+
+BOT_ID = 1
+FIRST_USER_ID = 10_000_000
+
+class FakeBotAPI(BaseRequest):
+    # Answers every Bot API method in-process; `latency` stands in for the
+    # round trip to Telegram
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        params = request_data.parameters if request_data else {}
+        return 200, await self.answer(url.rsplit("/", 1)[-1], params)
+
+    async def answer(self, endpoint: str, params) -> bytes:
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return json.dumps({"ok": True, "result": self._result(endpoint, params)}).encode()
+
+    def _result(self, endpoint, params):
+        if endpoint == "getMe":
+            return {"id": BOT_ID, "is_bot": True, "first_name": "Wishlist", "username": "loadtest_bot"}
+        if endpoint.startswith(("send", "edit")):
+            return {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+# ── Synthetic updates ────────────────────────────────────────────────────────
+_update_ids = itertools.count(1)
+
+def _user(telegram_id: int):
+    return {"id": telegram_id, "is_bot": False, "first_name": f"User{telegram_id}"}
+
+def message_update(telegram_id: int, text: str):
+    message = {
+        "message_id": next(_update_ids),
+        "date": int(time.time()),
+        "chat": {"id": telegram_id, "type": "private"},
+        "from": _user(telegram_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_update_ids), "message": message}
+
+def callback_update(telegram_id: int, data: str):
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(telegram_id),
+            "chat_instance": str(telegram_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "from": {"id": BOT_ID, "is_bot": True, "first_name": "Wishlist"},
+                "text": "🎁 Your Wishlist",
+            },
+        },
+    }
+
+async def user_session(telegram_id: int, wishes: int, admin: bool, lookup):
+    # Registration, add-wish, delete-confirm and (for admins) admin flows.
+    # Callback data needs the ids the bot assigned, so it is built between steps.
+    import bot
+    from services.UserService import UserService
+    from services.WishesService import WishesService
+
+    yield message_update(telegram_id, "/start")
+    yield message_update(telegram_id, f"User {telegram_id}")
+    for n in range(wishes):
+        yield message_update(telegram_id, "➕ Add Wish")
+        yield message_update(telegram_id, f"Wish {n} of user {telegram_id}")
+        yield message_update(telegram_id, str(n % 10 + 1))
+    yield message_update(telegram_id, "🎁 My Wishes")
+
+    user = await lookup(UserService.get_user_by_telegram_id, telegram_id)
+    current = await lookup(WishesService.get_wishes_by_user_id, user.id) if user else []
+    if current:
+        wish = current[-1]
+        yield callback_update(telegram_id, bot.callbacks.encode(bot.CB_DELETE, wish.id, user.id, 0, signer=telegram_id))
+        yield callback_update(telegram_id, bot.callbacks.encode(bot.CB_CONFIRM, wish.id, user.id, 0, signer=telegram_id))
+
+    if admin and user:
+        await lookup(_make_admin, telegram_id)
+        yield message_update(telegram_id, "🛠️ Admin Panel")
+        yield message_update(telegram_id, "👥 View All Users")
+        yield callback_update(telegram_id, bot.callbacks.encode(bot.CB_PAGE, 0, bot.PAGE_NEXT, 0))
+        yield message_update(telegram_id, "🎁 View All Wishes")
+        yield message_update(telegram_id, "/stats")
+        yield message_update(telegram_id, "/search wish")
+
+def _make_admin(telegram_id: int):
+    from config.db import get_db
+    from models.User import User
+    from services.UserService import UserService
+
+    with get_db() as db:
+        db.query(User).filter(User.telegram_id == telegram_id).update({"isAdmin": True})
+        db.commit()
+    UserService.user_cache.invalidate(telegram_id)
+
+async def _replayed(updates):
+    for update in updates:
+        yield update
+
+def read_recording(path: str):
+    # chat id -> that chat's updates, in recorded order
+    chats = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                body = update.get("message") or update.get("callback_query") or {}
+                chats[body.get("from", {}).get("id")].append(update)
+    return list(chats.values())
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+def _percentile(samples, q: float):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def slow_database(seconds: float):
+    # Stands in for a remote database: every statement holds its thread this long
+    from sqlalchemy import event
+    from config.db import engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+# ── Transports ───────────────────────────────────────────────────────────────
+# Each one hands an update to the bot and returns once it has been handled.
+WEBHOOK_SECRET = "loadtest-secret"
+TOKEN = "1:loadtest"
+
+class Waiters:
+    # update_id -> future resolved once the update has been fully handled
+    def __init__(self):
+        self._futures = {}
+
+    def expect(self, update_id: int):
+        future = self._futures[update_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    def resolve(self, update_id: int):
+        future = self._futures.pop(update_id, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+def on_processed(app, callback):
+    # Calls `await callback(update_id)` after the update processor is done
+    # with an update, persistence hooks included
+    processor = app.update_processor
+    process = processor.do_process_update
+
+    async def do_process_update(update, coroutine):
+        try:
+            await process(update, coroutine)
+        finally:
+            await callback(update.update_id)
+    processor.do_process_update = do_process_update
+
+async def start_application(request=None, base_url: str = None):
+    import bot
+
+    app = bot.build_application(TOKEN, request=request, base_url=base_url)
+    await app.initialize()
+    await app.start()
+    return app
+
+async def stop_application(app):
+    if app.updater.running:
+        await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+
+async def start_webhook(app, port: int):
+    url = f"http://127.0.0.1:{port}/telegram"
+    await app.updater.start_webhook(
+        listen="127.0.0.1",
+        port=port,
+        url_path="telegram",
+        webhook_url=url,
+        secret_token=WEBHOOK_SECRET,
+    )
+    return url
+
+async def post_update(client, url: str, data, secret: str = WEBHOOK_SECRET):
+    response = await client.post(url, json=data, headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+    if response.status_code != 200:
+        raise RuntimeError(f"Webhook answered {response.status_code} for update {data['update_id']}")
+
+class DirectDispatcher:
+    # Hands updates straight to the application, as its update fetcher does
+    measures_queries = True
+
+    def __init__(self, api):
+        self.api = api
+
+    async def start(self):
+        self.app = await start_application(request=self.api)
+
+    async def __call__(self, data):
+        from telegram import Update
+
+        update = Update.de_json(data, self.app.bot)
+        await self.app.update_processor.process_update(update, self.app.process_update(update))
+
+    async def stop(self):
+        await stop_application(self.app)
+
+class WebhookDispatcher:
+    # POSTs updates to the application's own webhook server, exactly as
+    # Telegram would, and waits until each one has been handled
+    measures_queries = True
+
+    def __init__(self, api, port: int):
+        self.api = api
+        self.port = port
+        self.waiters = Waiters()
+
+    async def start(self):
+        import httpx
+
+        self.app = await start_application(request=self.api)
+
+        async def processed(update_id):
+            self.waiters.resolve(update_id)
+        on_processed(self.app, processed)
+        self.url = await start_webhook(self.app, self.port)
+        self.client = httpx.AsyncClient(timeout=30)
+        # Requests without the right secret must be turned away
+        response = await self.client.post(
+            self.url, json=message_update(FIRST_USER_ID, "/start"),
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        )
+        if response.status_code != 403:
+            raise RuntimeError(f"Webhook accepted a wrong secret token ({response.status_code})")
+
+    async def __call__(self, data):
+        done = self.waiters.expect(data["update_id"])
+        await post_update(self.client, self.url, data)
+        await done
+
+    async def stop(self):
+        await self.client.aclose()
+        await stop_application(self.app)
+
+class FakeBotAPIServer:
+    # Serves a FakeBotAPI over HTTP to bot processes started with --serve,
+    # which report every update they finish to /processed
+    def __init__(self, api, waiters: Waiters):
+        self.api = api
+        self.waiters = waiters
+
+    async def start(self):
+        import tornado.httpserver
+        import tornado.netutil
+        import tornado.web
+
+        api, waiters = self.api, self.waiters
+
+        class BotMethod(tornado.web.RequestHandler):
+            async def post(self, endpoint):
+                params = {name: values[-1].decode() for name, values in self.request.body_arguments.items()}
+                self.set_header("Content-Type", "application/json")
+                self.write(await api.answer(endpoint, params))
+
+        class Processed(tornado.web.RequestHandler):
+            def post(self):
+                waiters.resolve(json.loads(self.request.body)["update_id"])
+
+        app = tornado.web.Application([(r"/bot[^/]+/(\w+)", BotMethod), (r"/processed", Processed)])
+        sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+        self.server = tornado.httpserver.HTTPServer(app)
+        self.server.add_sockets(sockets)
+        self.url = f"http://127.0.0.1:{sockets[0].getsockname()[1]}"
+
+    def stop(self):
+        self.server.stop()
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class WorkerPoolDispatcher:
+    # Starts bot processes sharing the database (SHARED_STATE=1) and spreads
+    # updates across them round-robin, like the load balancer of the
+    # "scaled" compose profile. A chat's consecutive updates therefore land
+    # on different processes.
+    measures_queries = False
+
+    def __init__(self, api, workers: int):
+        self.api = api
+        self.workers = workers
+        self.waiters = Waiters()
+        self.processes = []
+        self.urls = []
+
+    async def start(self):
+        import httpx
+
+        self.server = FakeBotAPIServer(self.api, self.waiters)
+        await self.server.start()
+        env = dict(os.environ, SHARED_STATE="1")
+        for _ in range(self.workers):
+            port = _free_port()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), "--serve", str(port), "--api-url", self.server.url,
+                env=env, stdout=asyncio.subprocess.PIPE,
+            )
+            self.processes.append(process)
+            while True:
+                line = await asyncio.wait_for(process.stdout.readline(), timeout=60)
+                if not line:
+                    raise RuntimeError(f"Worker on port {port} exited during startup")
+                if line.strip() == b"ready":
+                    break
+            asyncio.get_running_loop().create_task(self._drain(process))
+            self.urls.append(f"http://127.0.0.1:{port}/telegram")
+        self._next_url = itertools.cycle(self.urls)
+        self.client = httpx.AsyncClient(timeout=30)
+
+    @staticmethod
+    async def _drain(process):
+        async for line in process.stdout:
+            print(f"[worker {process.pid}] {line.decode().rstrip()}")
+
+    async def __call__(self, data):
+        done = self.waiters.expect(data["update_id"])
+        await post_update(self.client, next(self._next_url), data)
+        await asyncio.wait_for(done, timeout=60)
+
+    async def stop(self):
+        await self.client.aclose()
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            await process.wait()
+        self.server.stop()
+
+async def serve(port: int, api_url: str):
+    # One worker of --workers: a webhook bot process reporting each handled
+    # update. Starts up like bot.py, including its startup-time report.
+    import httpx
+    import bot
+
+    bot._startup_times["imports"] = time.perf_counter()
+    schema_synced = bot.init_db()
+    bot._startup_times["schema sync" if schema_synced else "schema check"] = time.perf_counter()
+    app = await start_application(base_url=f"{api_url}/bot")
+    bot._startup_times["application setup"] = time.perf_counter()
+    client = httpx.AsyncClient(timeout=30)
+
+    async def processed(update_id):
+        await client.post(f"{api_url}/processed", json={"update_id": update_id})
+    on_processed(app, processed)
+    await app.post_init(app)
+    await start_webhook(app, port)
+
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+    print("ready", flush=True)
+    await stop.wait()
+
+    await stop_application(app)
+    await app.post_shutdown(app)
+    await client.aclose()
+
+async def run(sessions, concurrency: int, latency: float = 0.0, record: str = None,
+              webhook_port: int = None, workers: int = 0):
+    from config.db import current_query_stats, init_db, query_totals, run_db
+
+    init_db()
+    api = FakeBotAPI(latency)
+    if workers:
+        dispatch = WorkerPoolDispatcher(api, workers)
+    elif webhook_port:
+        dispatch = WebhookDispatcher(api, webhook_port)
+    else:
+        dispatch = DirectDispatcher(api)
+    await dispatch.start()
+
+    # Statements the harness itself issues, subtracted from the totals
+    harness_queries = {"count": 0, "time": 0.0}
+
+    async def lookup(func, *args):
+        token = current_query_stats.set(harness_queries)
+        try:
+            return await run_db(func, *args)
+        finally:
+            current_query_stats.reset(token)
+
+    latencies, recorded = [], []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_chat(session):
+        async with slots:
+            async for data in session(lookup):
+                recorded.append(data)
+                started = time.perf_counter()
+                await dispatch(data)
+                latencies.append(time.perf_counter() - started)
+
+    queries_before = query_totals["count"]
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_chat(session) for session in sessions))
+    finally:
+        await dispatch.stop()
+    elapsed = time.perf_counter() - started
+    queries = query_totals["count"] - queries_before - harness_queries["count"]
+
+    if record:
+        with open(record, "w", encoding="utf-8") as f:
+            for data in recorded:
+                f.write(json.dumps(data, ensure_ascii=False) + "\n")
+    return {
+        "elapsed": elapsed,
+        "latencies": sorted(latencies),
+        # Statements run in worker processes can't be counted here
+        "queries": queries if dispatch.measures_queries else None,
+        "api_calls": api.calls,
+    }
+
+def report(result):
+    from metrics import render_summary
+
+    latencies, elapsed = result["latencies"], result["elapsed"]
+    if not latencies:
+        print("No updates were processed.")
+        return
+    # Summed update latency over wall time: ~1 when updates run one after another
+    parallelism = sum(latencies) / elapsed
+    parts = [
+        f"{len(latencies)} updates in {elapsed:.2f} s: {len(latencies) / elapsed:.0f} updates/s",
+        f"p50 {_percentile(latencies, 0.5) * 1000:.1f} ms",
+        f"p99 {_percentile(latencies, 0.99) * 1000:.1f} ms",
+    ]
+    if result["queries"] is not None:
+        parts.append(f"{result['queries'] / len(latencies):.1f} SQL/update")
+    parts.append(f"parallelism {parallelism:.1f}")
+    print(", ".join(parts))
+    print("Bot API calls: " + ", ".join(f"{name} {n}" for name, n in result["api_calls"].most_common()))
+    summary = render_summary()
+    if summary:
+        print(summary)
+
+def synthetic_sessions(users: int, wishes: int, admins: int, first_user_id: int = FIRST_USER_ID):
+    return [
+        lambda lookup, telegram_id=first_user_id + n, admin=n < admins:
+            user_session(telegram_id, wishes, admin, lookup)
+        for n in range(users)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against a fake Bot API")
+    parser.add_argument("--users", type=int, default=100, help="synthetic users (default 100)")
+    parser.add_argument("--wishes", type=int, default=3, help="wishes each user adds (default 3)")
+    parser.add_argument("--admins", type=int, default=1, help="users who also run the admin flow (default 1)")
+    parser.add_argument("--concurrency", type=int, default=32, help="chats in flight at once (default 32)")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Bot API round trip in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="simulated delay per SQL statement in seconds")
+    parser.add_argument("--webhook", type=int, metavar="PORT",
+                        help="POST updates to the bot's webhook server on this port instead")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="start this many webhook bot processes sharing the database and spread updates across them")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--api-url", help=argparse.SUPPRESS)
+    parser.add_argument("--replay", metavar="FILE", help="replay updates from a JSONL file instead")
+    parser.add_argument("--record", metavar="FILE", help="write the updates sent to a JSONL file")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    os.environ.setdefault("CALLBACK_SECRET", "loadtest")
+
+    if args.serve:
+        asyncio.run(serve(args.serve, args.api_url))
+        return
+    if args.workers:
+        # The harness's own cache invalidations must reach the workers too
+        os.environ["SHARED_STATE"] = "1"
+    if args.db_latency:
+        slow_database(args.db_latency)
+    if args.replay:
+        sessions = [lambda lookup, updates=updates: _replayed(updates) for updates in read_recording(args.replay)]
+    else:
+        sessions = synthetic_sessions(args.users, args.wishes, args.admins)
+    report(asyncio.run(run(sessions, args.concurrency, args.latency, args.record, args.webhook, args.workers)))
+
+if __name__ == "__main__":
+    main()
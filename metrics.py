@@ -0,0 +1,93 @@
+import bisect
+import functools
+import threading
+import time
+from telegram.ext import ConversationHandler
+from config.db import current_query_stats
+
+# Upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+class HandlerStats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def observe(self, elapsed: float, queries: dict, failed: bool):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.errors += failed
+        self.total_time += elapsed
+        self.sql_count += queries["count"]
+        self.sql_time += queries["time"]
+
+    def quantile(self, q: float):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+_lock = threading.Lock()
+handler_stats = {}
+
+def instrument(callback):
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        queries = {"count": 0, "time": 0.0}
+        token = current_query_stats.set(queries)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await callback(update, context)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            current_query_stats.reset(token)
+            with _lock:
+                stats = handler_stats.get(name)
+                if stats is None:
+                    stats = handler_stats[name] = HandlerStats()
+                stats.observe(elapsed, queries, failed)
+    return wrapper
+
+def _handlers_of(handler):
+    if isinstance(handler, ConversationHandler):
+        for sub in handler.entry_points + handler.fallbacks:
+            yield from _handlers_of(sub)
+        for state_handlers in handler.states.values():
+            for sub in state_handlers:
+                yield from _handlers_of(sub)
+    else:
+        yield handler
+
+def instrument_application(app):
+    # Wrap every registered callback, including those inside conversations
+    for group in app.handlers.values():
+        for handler in group:
+            for leaf in _handlers_of(handler):
+                leaf.callback = instrument(leaf.callback)
+
+def render_summary():
+    lines = []
+    with _lock:
+        for name, stats in sorted(handler_stats.items(), key=lambda item: -item[1].count):
+            avg_ms = stats.total_time / stats.count * 1000
+            p99 = stats.quantile(0.99)
+            lines.append(
+                f"{name}: {stats.count} calls, {stats.errors} errors, avg {avg_ms:.1f} ms, "
+                f"p50 ≤{stats.quantile(0.5) * 1000:.0f} ms, "
+                f"p99 ≤{'∞' if p99 == float('inf') else f'{p99 * 1000:.0f}'} ms, "
+                f"{stats.sql_count / stats.count:.1f} SQL/update"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+
+from config.db import Base
+
+class CacheEvent(Base):
+    __tablename__ = "cache_events"
+    id = Column(Integer, primary_key=True)
+    # "user" (key is a telegram_id) or "wishes" (key is a users.id)
+    kind = Column(String, nullable=False)
+    key = Column(BigInteger, nullable=False)
+    origin = Column(String, nullable=False)
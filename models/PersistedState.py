@@ -0,0 +1,10 @@
+from sqlalchemy import JSON, Column, String
+
+from config.db import Base
+
+class PersistedState(Base):
+    __tablename__ = "bot_state"
+    # e.g. "user_data" or "conversation:add_wish"
+    kind = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    data = Column(JSON, nullable=True)
@@ -0,0 +1,7 @@
+from sqlalchemy import Column, Integer
+
+from config.db import Base
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
@@ -1,14 +1,25 @@
-from sqlalchemy import CheckConstraint, Column, Integer, String
+from sqlalchemy import CheckConstraint, Column, Index, Integer, String
 
 from config.db import Base
 
 class Wish(Base):
     __tablename__ = "wishes"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(Integer)
     text = Column(String, nullable=False)
     priority = Column(Integer, nullable=False, default=5)
+    # Hash of the normalized text; NULL until the dedupe pass backfills old rows
+    text_hash = Column(String(64), nullable=True)
 
     __table_args__ = (
         CheckConstraint("priority >= 1 AND priority <= 10", name="priority_range"),
+        # Serves per-user listings in display order straight from the index
+        Index("ix_wishes_user_id_priority", user_id, priority.desc(), id),
+        # A user can't hold the same wish twice, so retries and double taps are no-ops
+        Index("ux_wishes_user_id_text_hash", user_id, text_hash, unique=True),
+        # Trigram index for WishesService.search (needs the pg_trgm extension)
+        Index(
+            "ix_wishes_text_trgm", text,
+            postgresql_using="gin", postgresql_ops={"text": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
     )
\ No newline at end of file
@@ -0,0 +1,211 @@
+import asyncio
+import json
+from sqlalchemy import and_, or_
+from telegram import Update
+from telegram.ext import BasePersistence, PersistenceInput
+from config.db import get_db, run_db, upsert_insert
+from models.PersistedState import PersistedState
+
+# Stores user_data and ConversationHandler states in the bot_state table.
+# Every changed key is its own row, upserted independently, so several bot
+# processes sharing the database never overwrite each other's entries.
+# python-telegram-bot already debounces writes to once per update_interval;
+# the writes of one such run are additionally batched into one transaction.
+#
+# With shared=True (several replicas behind one webhook), the previous
+# update of a chat may have been handled by another replica. load_chat_state
+# and save_chat_state run around each update, under the chat lock: the
+# chat's conversation states and user_data are re-read before it, and
+# whatever it changed is committed before the next update can start. The
+# periodic update_* calls are skipped then, as their values may be older
+# than what another replica has written since.
+class DatabasePersistence(BasePersistence):
+    def __init__(self, update_interval: float = 5, shared: bool = False):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.shared = shared
+        # name -> ConversationHandler, and the application's user_data;
+        # both set by the caller, used by load_chat_state/save_chat_state
+        self.conversation_handlers = {}
+        self.user_data = None
+        # (kind, key) -> data queued for the next write, and the batch being written
+        self._pending = {}
+        self._writing = {}
+        self._write_lock = asyncio.Lock()
+        self._flush_task = None
+        # update_id -> {(kind, key): data} as loaded before that update
+        self._loaded = {}
+
+    # ── Loading ──────────────────────────────────────────────────────────────
+    @staticmethod
+    def _load(kind: str):
+        with get_db() as db:
+            return db.query(PersistedState.key, PersistedState.data).filter(PersistedState.kind == kind).all()
+
+    async def get_user_data(self):
+        rows = await run_db(self._load, "user_data")
+        return {int(key): data for key, data in rows}
+
+    async def get_conversations(self, name: str):
+        rows = await run_db(self._load, f"conversation:{name}")
+        return {tuple(json.loads(key)): data for key, data in rows}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # ── Writing ──────────────────────────────────────────────────────────────
+    def _queue(self, kind: str, key: str, data):
+        # None means delete the row
+        self._pending[(kind, key)] = data
+        if self._flush_task is None:
+            # Runs after the other update_* calls of this persistence run,
+            # which the application schedules together
+            self._flush_task = asyncio.get_running_loop().create_task(self._write_pending())
+        return self._flush_task
+
+    async def _write_pending(self):
+        # One batch at a time, so a key's writes can't commit out of order
+        async with self._write_lock:
+            batch, self._pending = self._pending, {}
+            self._flush_task = None
+            self._writing = batch
+            try:
+                await run_db(self._write_batch, batch)
+            finally:
+                self._writing = {}
+
+    @staticmethod
+    def _write_batch(batch: dict):
+        insert = upsert_insert()
+        with get_db() as db:
+            for (kind, key), data in batch.items():
+                if data is None:
+                    db.query(PersistedState).filter(
+                        PersistedState.kind == kind, PersistedState.key == key,
+                    ).delete(synchronize_session=False)
+                elif insert is not None:
+                    stmt = insert(PersistedState).values(kind=kind, key=key, data=data)
+                    db.execute(stmt.on_conflict_do_update(
+                        index_elements=[PersistedState.kind, PersistedState.key],
+                        set_={"data": stmt.excluded.data},
+                    ))
+                else:
+                    db.merge(PersistedState(kind=kind, key=key, data=data))
+            db.commit()
+
+    async def update_user_data(self, user_id: int, data):
+        if not self.shared:
+            await self._queue("user_data", str(user_id), data)
+
+    async def drop_user_data(self, user_id: int):
+        await self._queue("user_data", str(user_id), None)
+
+    async def update_conversation(self, name: str, key, new_state):
+        if not self.shared:
+            await self._queue(f"conversation:{name}", json.dumps(list(key)), new_state)
+
+    async def update_chat_data(self, chat_id: int, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    # ── Shared mode ──────────────────────────────────────────────────────────
+    @staticmethod
+    def _load_keys(keys):
+        with get_db() as db:
+            return (
+                db.query(PersistedState.kind, PersistedState.key, PersistedState.data)
+                .filter(or_(*(and_(PersistedState.kind == kind, PersistedState.key == key) for kind, key in keys)))
+                .all()
+            )
+
+    def _chat_state(self, update):
+        # (kind, key) -> where that row lives in memory, for this update's chat and user
+        if not isinstance(update, Update) or not update.effective_user:
+            return {}
+        user_id = update.effective_user.id
+        state = {}
+        if self.user_data is not None:
+            state[("user_data", str(user_id))] = ("user_data", user_id)
+        if update.effective_chat:
+            key = (update.effective_chat.id, user_id)
+            for name, handler in self.conversation_handlers.items():
+                state[(f"conversation:{name}", json.dumps(list(key)))] = (handler, key)
+        return state
+
+    def _current(self, location):
+        owner, key = location
+        if owner == "user_data":
+            return dict(self.user_data.get(key) or {}) or None
+        return owner._conversations.get(key)
+
+    async def load_chat_state(self, update):
+        # Must run before the update reaches the handlers, which read their
+        # state in check_update, so it is hooked into the update processor
+        if not self.shared:
+            return
+        locations = self._chat_state(update)
+        if not locations:
+            return
+        rows = await run_db(self._load_keys, list(locations))
+        loaded = {(kind, key): data for kind, key, data in rows}
+        # Queued or in-flight writes are newer than the table
+        for queued in (self._writing, self._pending):
+            loaded.update((item, data) for item, data in queued.items() if item in locations)
+
+        for item, (owner, key) in locations.items():
+            data = loaded.get(item)
+            if owner == "user_data":
+                user_data = self.user_data[key]
+                user_data.clear()
+                user_data.update(data or {})
+            elif data is not None:
+                owner._conversations.update_no_track({key: data})
+            else:
+                owner._conversations.data.pop(key, None)
+        self._loaded[update.update_id] = {item: self._current(location) for item, location in locations.items()}
+
+    async def save_chat_state(self, update):
+        # Commits what the update changed before the chat lock is released,
+        # so the chat's next update sees it on whichever replica handles it
+        if not self.shared:
+            return
+        before = self._loaded.pop(getattr(update, "update_id", None), None)
+        if before is None:
+            return
+        flush = None
+        for item, location in self._chat_state(update).items():
+            data = self._current(location)
+            if data != before.get(item):
+                flush = self._queue(*item, data)
+        if flush is not None:
+            await flush
+
+    async def refresh_user_data(self, user_id: int, user_data):
+        # Shared mode reloads it in load_chat_state, before the handlers run
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        if self._flush_task is not None:
+            await self._flush_task
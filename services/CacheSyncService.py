@@ -0,0 +1,98 @@
+import os
+import socket
+import time
+import uuid
+from sqlalchemy import func, or_, text
+from config.db import engine, get_db
+from models.CacheEvent import CacheEvent
+
+# Arbitrary id for the advisory lock that elects the pruning replica
+PRUNE_LOCK_ID = 0x8_03_00
+# Most skipped ids tracked per jump of the cursor
+MAX_GAPS = 1000
+
+class CacheSyncService:
+    # With several bot processes on one database, every local cache
+    # invalidation is also written to cache_events; the other processes
+    # poll that table and drop the same entries.
+    enabled = os.getenv("SHARED_STATE", "false").lower() in ("1", "true", "yes")
+    origin = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    keep_events = int(os.getenv("CACHE_EVENTS_KEEP", "10000"))
+    # Postgres hands out ids when rows are inserted, but transactions can
+    # commit in another order, so an id below the cursor may still appear.
+    # Ids skipped over are re-checked until gap_timeout; by then their
+    # transaction has committed or rolled back.
+    gap_timeout = float(os.getenv("CACHE_EVENTS_GAP_TIMEOUT", "60"))
+    _cursor = 0
+    _gaps = {}  # missing event id -> time.monotonic() when skipped
+
+    @staticmethod
+    def publish(db, kind: str, keys):
+        # Adds the events to the caller's session, to be committed in the
+        # same transaction as the change they announce
+        if not CacheSyncService.enabled:
+            return
+        db.add_all(CacheEvent(kind=kind, key=key, origin=CacheSyncService.origin) for key in keys)
+    @staticmethod
+    def start_sync():
+        # Only events published from now on concern this process
+        with get_db() as db:
+            CacheSyncService._cursor = db.query(func.max(CacheEvent.id)).scalar() or 0
+        CacheSyncService._gaps = {}
+    @staticmethod
+    def apply_remote_events(limit: int = 1000):
+        from services.UserService import UserService
+        from services.WishesService import WishesService
+
+        gaps = CacheSyncService._gaps
+        now = time.monotonic()
+        for event_id, skipped_at in list(gaps.items()):
+            if now - skipped_at > CacheSyncService.gap_timeout:
+                del gaps[event_id]
+
+        cursor = CacheSyncService._cursor
+        with get_db() as db:
+            condition = CacheEvent.id > cursor
+            if gaps:
+                condition = or_(condition, CacheEvent.id.in_(list(gaps)))
+            events = (
+                db.query(CacheEvent.id, CacheEvent.kind, CacheEvent.key, CacheEvent.origin)
+                .filter(condition)
+                .order_by(CacheEvent.id)
+                .limit(limit)
+                .all()
+            )
+        reindex = set()
+        for event in events:
+            if event.id > cursor:
+                gaps.update((missing, now) for missing in range(max(cursor + 1, event.id - MAX_GAPS), event.id))
+                cursor = event.id
+            else:
+                gaps.pop(event.id, None)
+            if event.origin == CacheSyncService.origin:
+                continue
+            if event.kind == "user":
+                UserService.user_cache.invalidate(event.key)
+            elif event.kind == "wishes":
+                WishesService.wishes_changed(event.key)
+                reindex.add(event.key)
+        CacheSyncService._cursor = cursor
+        if reindex:
+            WishesService.reindex_users(reindex)
+        return len(events)
+    @staticmethod
+    def prune_events():
+        # Leader duty: on Postgres only the replica holding the advisory
+        # lock prunes; elsewhere the single process does it itself
+        with get_db() as db:
+            if engine.dialect.name == "postgresql":
+                if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": PRUNE_LOCK_ID}).scalar():
+                    return 0
+            newest = db.query(func.max(CacheEvent.id)).scalar() or 0
+            deleted = (
+                db.query(CacheEvent)
+                .filter(CacheEvent.id <= newest - CacheSyncService.keep_events)
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return deleted
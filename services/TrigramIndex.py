@@ -0,0 +1,173 @@
+import itertools
+import math
+import re
+import threading
+
+_WORD = re.compile(r"\w+")
+# Most wishes a global search scores; bounds its cost for very common terms
+MAX_CANDIDATES = 5000
+BUILD_BATCH = 1000
+
+def trigrams(text: str):
+    # Same shape as pg_trgm: lowercase words padded with two leading and one
+    # trailing space
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# In-process stand-in for a pg_trgm GIN index, used when the database can't
+# index text itself (SQLite). Maps trigram -> wish ids, so a search only
+# touches wishes sharing a trigram with the query.
+#
+# Changes are only tracked once a build has started: until the first search
+# the index costs nothing. Changes made while build() scans the table are
+# applied as they come, and the scan skips wishes removed meanwhile, so it
+# can't bring them back.
+class TrigramIndex:
+    def __init__(self):
+        self._postings = {}
+        self._wishes = {}
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Wish and user ids removed since the running build started
+        self._removed = None
+        self._removed_users = None
+        self.tracking = False
+        self.built = False
+
+    def build(self, load):
+        # load() returns an iterable over every stored wish; it is called
+        # only once changes are being tracked. Concurrent callers wait for
+        # the one build.
+        with self._build_lock:
+            if self.built:
+                return
+            with self._lock:
+                self._removed, self._removed_users = set(), set()
+                self.tracking = True
+            try:
+                wishes = iter(load())
+                while batch := list(itertools.islice(wishes, BUILD_BATCH)):
+                    with self._lock:
+                        for wish in batch:
+                            if wish.id not in self._removed and wish.user_id not in self._removed_users:
+                                self._add(wish)
+            except BaseException:
+                with self._lock:
+                    self._postings, self._wishes, self._by_user = {}, {}, {}
+                    self.tracking = False
+                raise
+            finally:
+                with self._lock:
+                    self._removed = self._removed_users = None
+            self.built = True
+
+    def add(self, wish):
+        with self._lock:
+            if self.tracking:
+                self._add(wish)
+
+    def _add(self, wish):
+        grams = trigrams(wish.text)
+        self._wishes[wish.id] = (wish, len(grams))
+        self._by_user.setdefault(wish.user_id, set()).add(wish.id)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(wish.id)
+
+    def remove(self, wish_id: int):
+        with self._lock:
+            if self._removed is not None:
+                self._removed.add(wish_id)
+            self._remove(wish_id)
+
+    def remove_user(self, user_id: int):
+        with self._lock:
+            self._remove_user(user_id)
+
+    def replace_users(self, user_ids, wishes):
+        # Swaps in the given users' current wishes in one step, so a search
+        # never sees them half reloaded
+        with self._lock:
+            if not self.tracking:
+                return
+            for user_id in user_ids:
+                self._remove_user(user_id)
+            for wish in wishes:
+                self._add(wish)
+
+    def _remove_user(self, user_id: int):
+        if self._removed_users is not None:
+            self._removed_users.add(user_id)
+        for wish_id in list(self._by_user.get(user_id, ())):
+            self._remove(wish_id)
+
+    def _remove(self, wish_id: int):
+        entry = self._wishes.pop(wish_id, None)
+        if entry is None:
+            return
+        wish, _ = entry
+        user_ids = self._by_user.get(wish.user_id)
+        if user_ids is not None:
+            user_ids.discard(wish_id)
+            if not user_ids:
+                del self._by_user[wish.user_id]
+        for gram in trigrams(wish.text):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(wish_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def _candidates(self, grams, needle: str, threshold: float, max_candidates: int):
+        # A wish scoring `threshold` shares at least that fraction of the
+        # query's trigrams (its own can only lower the score), so it is in
+        # one of the len(grams) - needed + 1 rarest posting lists; a wish
+        # containing the query contains each of its words' inner trigrams,
+        # so it is in the rarest of those. Lists are read rarest first and
+        # reading stops at max_candidates, so for terms in a large part of
+        # the table the best matches are picked from a sample.
+        lists = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        needed = max(1, math.ceil(threshold * len(grams) - 1e-9))
+        sources = lists[:len(lists) - needed + 1]
+        inner = [
+            self._postings.get(word[i:i + 3], ())
+            for word in _WORD.findall(needle)
+            for i in range(len(word) - 2)
+        ]
+        if inner:
+            sources.append(min(inner, key=len))
+        else:
+            # Too short to have inner trigrams: any list may hold a match
+            sources = lists
+        candidates = set()
+        for ids in sorted(sources, key=len):
+            for wish_id in ids:
+                candidates.add(wish_id)
+                if len(candidates) >= max_candidates:
+                    return candidates
+        return candidates
+
+    def search(self, query: str, user_id: int = None, limit: int = 20, threshold: float = 0.3,
+               max_candidates: int = MAX_CANDIDATES):
+        grams = trigrams(query)
+        needle = query.lower()
+        with self._lock:
+            if user_id is not None:
+                # A single wishlist is small; score all of it
+                candidates = self._by_user.get(user_id, ())
+            else:
+                candidates = self._candidates(grams, needle, threshold, max_candidates)
+            results = []
+            for wish_id in candidates:
+                wish, size = self._wishes[wish_id]
+                common = sum(1 for gram in grams if wish_id in self._postings.get(gram, ()))
+                # pg_trgm similarity: shared / union
+                union = len(grams) + size - common
+                score = common / union if union else 0.0
+                if score >= threshold or needle in wish.text.lower():
+                    results.append((score, wish))
+        results.sort(key=lambda item: (-item[0], item[1].id))
+        return [wish for _, wish in results[:limit]]
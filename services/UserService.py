@@ -1,8 +1,19 @@
+import os
+from sqlalchemy import func
 from models.User import User
-from config.db import get_db
+from models.Wish import Wish
+from config.db import get_db, keyset_page
+from services.CacheSyncService import CacheSyncService
+from services.LRUCache import LRUCache, MISSING
 from services.WishesService import WishesService
 
 class UserService: 
+    # telegram_id -> User (or None for unknown users), read-through
+    user_cache = LRUCache(
+        maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+    )
+
     @staticmethod
     def get_or_create_user(telegram_id: int, name: str, username: str = None):
         with get_db() as db:
@@ -10,37 +21,86 @@ class UserService:
             if not user:
                 user = User(telegram_id=telegram_id, name=name, username=username)
                 db.add(user)
+                # Other replicas may have cached the user as unknown
+                CacheSyncService.publish(db, "user", [telegram_id])
                 db.commit()
                 db.refresh(user)
-            return user
+        UserService.user_cache.set(telegram_id, user)
+        return user
     @staticmethod
     def get_user_by_telegram_id(telegram_id: int):
+        user = UserService.user_cache.get(telegram_id)
+        if user is not MISSING:
+            return user
         with get_db() as db:
-            return db.query(User).filter(User.telegram_id == telegram_id).first()
+            user = db.query(User).filter(User.telegram_id == telegram_id).first()
+        # With replicas, "unknown" can turn false on another one at any time,
+        # sooner than its cache event would arrive here; don't cache it then
+        if user is not None or not CacheSyncService.enabled:
+            UserService.user_cache.set(telegram_id, user)
+        return user
     @staticmethod
     def update_username(telegram_id: int, username: str):
         with get_db() as db:
             user = db.query(User).filter(User.telegram_id == telegram_id).first()
             if user:
                 user.username = username
+                CacheSyncService.publish(db, "user", [telegram_id])
                 db.commit()
                 db.refresh(user)
-            return user
+        UserService.user_cache.invalidate(telegram_id)
+        return user
     @staticmethod
     def delete_user(telegram_id: int):
+        return UserService.delete_users([telegram_id]) == 1
+    @staticmethod
+    def delete_users(telegram_ids):
+        # Bulk DELETEs in one transaction, however many wishes the users have
         with get_db() as db:
-            user = db.query(User).filter(User.telegram_id == telegram_id).first()
-            if user:
-                db.delete(user)
-                wishes = WishesService.get_wishes_by_user_id(user.id)
-                for wish in wishes:
-                    db.delete(wish)
+            rows = db.query(User.id, User.telegram_id).filter(User.telegram_id.in_(telegram_ids)).all()
+            user_ids = [row.id for row in rows]
+            if user_ids:
+                db.query(Wish).filter(Wish.user_id.in_(user_ids)).delete(synchronize_session=False)
+                db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+                CacheSyncService.publish(db, "wishes", user_ids)
+                CacheSyncService.publish(db, "user", [row.telegram_id for row in rows])
                 db.commit()
-                return True
-            return False
+        for row in rows:
+            WishesService.wishes_changed(row.id)
+            WishesService.search_index.remove_user(row.id)
+        for telegram_id in telegram_ids:
+            UserService.user_cache.invalidate(telegram_id)
+        return len(user_ids)
+    @staticmethod
+    def list_users(after_id: int = None, before_id: int = None, limit: int = None, exclude_telegram_id: int = None):
+        with get_db() as db:
+            query = db.query(User)
+            if exclude_telegram_id is not None:
+                query = query.filter(User.telegram_id != exclude_telegram_id)
+            return keyset_page(query, User.id, after_id, before_id, limit)
     @staticmethod
-    def list_users():
+    def list_users_with_wish_counts(after_id: int = None, before_id: int = None, limit: int = None):
         with get_db() as db:
-            return db.query(User).all()
+            query = (
+                db.query(User, func.count(Wish.id))
+                .outerjoin(Wish, Wish.user_id == User.id)
+                .group_by(User.id)
+            )
+            return keyset_page(query, User.id, after_id, before_id, limit)
     
-    
\ No newline at end of file
+    
+    @staticmethod
+    def stream_users_with_wishes(batch_size: int = 1000):
+        # One row per (user, wish); users without wishes get empty wish columns.
+        # Rows come from a server-side cursor batch_size at a time, so consume
+        # the generator on the thread that started it.
+        with get_db() as db:
+            query = (
+                db.query(
+                    User.id, User.telegram_id, User.name, User.username, User.isAdmin,
+                    Wish.id, Wish.text, Wish.priority,
+                )
+                .outerjoin(Wish, Wish.user_id == User.id)
+                .order_by(User.id, Wish.priority.desc(), Wish.id)
+            )
+            yield from query.yield_per(batch_size)
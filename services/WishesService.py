@@ -1,32 +1,243 @@
-from config.db import get_db
+import hashlib
+import itertools
+import os
+from sqlalchemy import func, insert, or_, text, update
+from config.db import engine, get_db, keyset_page, upsert_insert
+from models.User import User
 from models.Wish import Wish
+from services.CacheSyncService import CacheSyncService
+from services.LRUCache import LRUCache, MISSING
+from services.TrigramIndex import TrigramIndex
+
+# Arbitrary id for the advisory lock that keeps one replica deduping at a time
+DEDUPE_LOCK_ID = 0x8_03_01
+
+def text_hash(wish_text: str):
+    normalized = " ".join(wish_text.casefold().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+def _insert_sorted(wishes: tuple, wish):
+    # Keep priority-descending order; newer wishes go after equal priorities
+    i = 0
+    while i < len(wishes) and wishes[i].priority >= wish.priority:
+        i += 1
+    return wishes[:i] + (wish,) + wishes[i:]
+
+def _all_wishes():
+    with get_db() as db:
+        yield from db.query(Wish).yield_per(1000)
 
 class WishesService:
+    # user_id -> tuple of that user's wishes sorted by priority, write-through.
+    # With replicas, entries also expire, in case a cache event is missed.
+    wish_cache = LRUCache(
+        maxsize=int(os.getenv("WISH_CACHE_SIZE", "1000")),
+        ttl=float(os.getenv("WISH_CACHE_TTL", "300")) if CacheSyncService.enabled else None,
+    )
+    # user_id -> version bumped on every change, for caches of derived views.
+    # Drawn from one global counter and never evicted, so a version is
+    # never reused for different contents.
+    _versions = {}
+    _version_counter = itertools.count(1)
+    # Text search on databases without pg_trgm; built on first search
+    search_index = TrigramIndex()
+
+    @staticmethod
+    def wishlist_version(user_id: int):
+        return WishesService._versions.get(user_id, 0)
+    @staticmethod
+    def wishes_changed(user_id: int, update=None):
+        # Apply `update` to the cached wishlist, or drop it if none is given.
+        # The version is bumped first, so a reader that queried before this
+        # change won't store its result (see get_wishes_by_user_id).
+        # Other replicas learn of the change from the "wishes" event the
+        # writer publishes in its transaction.
+        WishesService._versions[user_id] = next(WishesService._version_counter)
+        if update is None:
+            WishesService.wish_cache.invalidate(user_id)
+        else:
+            WishesService.wish_cache.update(user_id, update)
+
     @staticmethod
     def create_wish(user_id: int, wish_text: str, priority: int = 5):
-        if priority < 1 or priority > 10:
-            raise ValueError("Priority must be between 1 and 10")
-        
+        # Idempotent: the same wish sent twice returns the stored row.
+        # Returns (wish, created); created is False for an existing wish.
+        created = WishesService.create_wishes(user_id, [(wish_text, priority)])
+        if created:
+            return created[0], True
         with get_db() as db:
-            wish = Wish(user_id=user_id, text=wish_text, priority=priority)
-            db.add(wish)
+            wish = (
+                db.query(Wish)
+                .filter(Wish.user_id == user_id, Wish.text_hash == text_hash(wish_text))
+                .first()
+            )
+        return wish, False
+    @staticmethod
+    def create_wishes(user_id: int, items):
+        # items: iterable of (text, priority); all-or-nothing, one transaction.
+        # Wishes the user already has are skipped; returns only the new ones.
+        items = list(items)
+        for _, priority in items:
+            if priority < 1 or priority > 10:
+                raise ValueError("Priority must be between 1 and 10")
+
+        values, seen = [], set()
+        for wish_text, priority in items:
+            digest = text_hash(wish_text)
+            if digest not in seen:
+                seen.add(digest)
+                values.append({"user_id": user_id, "text": wish_text, "priority": priority, "text_hash": digest})
+        if not values:
+            return []
+
+        # A single multi-row INSERT ... RETURNING, rather than one per wish
+        upsert = upsert_insert()
+        if upsert is not None:
+            stmt = upsert(Wish).values(values).on_conflict_do_nothing(
+                index_elements=[Wish.user_id, Wish.text_hash],
+            )
+        else:
+            stmt = insert(Wish).values(values)
+        stmt = stmt.returning(Wish.id, Wish.user_id, Wish.text, Wish.priority, Wish.text_hash)
+        with get_db() as db:
+            rows = db.execute(stmt).all()
+            if rows:
+                CacheSyncService.publish(db, "wishes", [user_id])
             db.commit()
-            db.refresh(wish)
-            return wish
+        wishes = sorted((Wish(**row._mapping) for row in rows), key=lambda w: w.id)
+        if not wishes:
+            return []
+
+        def insert_all(cached):
+            for wish in wishes:
+                cached = _insert_sorted(cached, wish)
+            return cached
+        WishesService.wishes_changed(user_id, insert_all)
+        for wish in wishes:
+            WishesService.search_index.add(wish)
+        return wishes
     @staticmethod
-    def get_wishes_by_user_id(user_id: int):
+    def dedupe_batch(batch_size: int = 500):
+        # Backfills text_hash for rows created before it existed, deleting
+        # the later copies of duplicates. Works in small batches with a
+        # commit each, so the wishes table is never locked for long.
+        # Returns the number of rows examined (0 when done).
         with get_db() as db:
-            return db.query(Wish).filter(Wish.user_id == user_id).all()
+            if engine.dialect.name == "postgresql":
+                if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": DEDUPE_LOCK_ID}).scalar():
+                    return 0
+            rows = (
+                db.query(Wish.id, Wish.user_id, Wish.text)
+                .filter(Wish.text_hash.is_(None))
+                .order_by(Wish.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                return 0
+
+            hashes = {row.id: text_hash(row.text) for row in rows}
+            taken = set(
+                db.query(Wish.user_id, Wish.text_hash)
+                .filter(
+                    Wish.user_id.in_({row.user_id for row in rows}),
+                    Wish.text_hash.in_(set(hashes.values())),
+                )
+                .all()
+            )
+            updates, duplicates = [], []
+            for row in rows:
+                key = (row.user_id, hashes[row.id])
+                if key in taken:
+                    duplicates.append(row)
+                else:
+                    taken.add(key)
+                    updates.append({"id": row.id, "text_hash": hashes[row.id]})
+            if duplicates:
+                db.query(Wish).filter(Wish.id.in_([row.id for row in duplicates])).delete(synchronize_session=False)
+                CacheSyncService.publish(db, "wishes", {row.user_id for row in duplicates})
+            if updates:
+                db.execute(update(Wish), updates)
+            db.commit()
+
+        for row in duplicates:
+            WishesService.search_index.remove(row.id)
+        for user_id in {row.user_id for row in duplicates}:
+            WishesService.wishes_changed(user_id)
+        return len(rows)
+    @staticmethod
+    def reindex_users(user_ids):
+        # Another replica changed these users' wishes; reload their entries
+        # in the search index, if it is in use
+        if not WishesService.search_index.tracking:
+            return
+        user_ids = list(user_ids)
+        with get_db() as db:
+            wishes = db.query(Wish).filter(Wish.user_id.in_(user_ids)).all()
+        WishesService.search_index.replace_users(user_ids, wishes)
+    @staticmethod
+    def get_wishes_by_user_id(user_id: int, limit: int = None, offset: int = 0):
+        wishes = WishesService.wish_cache.get(user_id)
+        if wishes is not MISSING:
+            end = offset + limit if limit is not None else None
+            return list(wishes[offset:end])
+
+        version = WishesService.wishlist_version(user_id)
+        with get_db() as db:
+            query = (
+                db.query(Wish)
+                .filter(Wish.user_id == user_id)
+                .order_by(Wish.priority.desc(), Wish.id)
+            )
+            if limit is not None or offset:
+                # Partial pages are served from the index, not cached
+                return query.offset(offset).limit(limit).all()
+            wishes = query.all()
+        # Skip caching if a write landed while we were querying; the list
+        # may predate it, and that write found nothing to update
+        WishesService.wish_cache.set_if(
+            user_id, tuple(wishes), lambda: WishesService.wishlist_version(user_id) == version,
+        )
+        return wishes
     @staticmethod
     def delete_wish(wish_id: int, user_id: int):
         with get_db() as db:
             wish = db.query(Wish).filter(Wish.id == wish_id, Wish.user_id == user_id).first()
-            if wish:
-                db.delete(wish)
-                db.commit()
-                return True
-            return False
+            if not wish:
+                return False
+            db.delete(wish)
+            CacheSyncService.publish(db, "wishes", [user_id])
+            db.commit()
+        WishesService.wishes_changed(
+            user_id, lambda wishes: tuple(w for w in wishes if w.id != wish_id)
+        )
+        WishesService.search_index.remove(wish_id)
+        return True
+    @staticmethod
+    def list_all_wishes(after_id: int = None, before_id: int = None, limit: int = None):
+        with get_db() as db:
+            return keyset_page(db.query(Wish), Wish.id, after_id, before_id, limit)
     @staticmethod
-    def list_all_wishes():
+    def list_wishes_with_owners(after_id: int = None, before_id: int = None, limit: int = None):
         with get_db() as db:
-            return db.query(Wish).all()
\ No newline at end of file
+            query = db.query(Wish, User.name).outerjoin(User, User.id == Wish.user_id)
+            return keyset_page(query, Wish.id, after_id, before_id, limit)
+    @staticmethod
+    def search(query: str, user_id: int = None, limit: int = 20):
+        query = query.strip()
+        if not query:
+            return []
+
+        if engine.dialect.name == "postgresql":
+            # Both conditions are served by the pg_trgm GIN index on text
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            with get_db() as db:
+                q = db.query(Wish).filter(or_(Wish.text.ilike(f"%{escaped}%", escape="\\"), Wish.text.op("%")(query)))
+                if user_id is not None:
+                    q = q.filter(Wish.user_id == user_id)
+                return q.order_by(func.similarity(Wish.text, query).desc(), Wish.id).limit(limit).all()
+
+        index = WishesService.search_index
+        if not index.built:
+            index.build(_all_wishes)
+        return index.search(query, user_id=user_id, limit=limit)
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Tests import the bot's modules from the repository root. config.db reads
+# DATABASE_URL on import, so point it at a throwaway SQLite file first.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/tests.db")
+os.environ.setdefault("CALLBACK_SECRET", "tests")
@@ -0,0 +1,65 @@
+import asyncio
+from telegram.error import BadRequest, Forbidden, NetworkError, TimedOut
+import broadcast
+from broadcast import Broadcaster, TokenBucket, chat_bucket, global_bucket
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append(chat_id)
+
+async def numbers(count):
+    for chat_id in range(count):
+        yield chat_id
+
+def test_failing_progress_callback_does_not_stall_broadcast():
+    async def report(sent, failed):
+        raise RuntimeError("message to edit not found")
+
+    async def main():
+        bot = FakeBot()
+        broadcaster = Broadcaster(bot, workers=2, bucket=TokenBucket(10_000))
+        result = await asyncio.wait_for(
+            broadcaster.run(numbers(50), "hi", on_progress=report, progress_every=1), timeout=5
+        )
+        return result, bot.sent
+
+    (sent, failed), delivered = asyncio.run(main())
+    assert (sent, failed) == (50, 0)
+    assert sorted(delivered) == list(range(50))
+
+def test_buckets_are_shared_across_broadcasts():
+    assert Broadcaster(FakeBot()).global_bucket is Broadcaster(FakeBot()).global_bucket is global_bucket()
+    assert chat_bucket(42) is chat_bucket(42)
+    assert chat_bucket(42) is not chat_bucket(43)
+
+class FlakyBot(FakeBot):
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = errors
+        self.attempts = 0
+
+    async def send_message(self, chat_id, text):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        await super().send_message(chat_id, text)
+
+def send_one(bot):
+    async def main():
+        return await Broadcaster(bot, workers=1, bucket=TokenBucket(10_000)).run(numbers(1), "hi")
+    return asyncio.run(main())
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(broadcast, "RETRY_DELAY", 0)
+    bot = FlakyBot([TimedOut(), NetworkError("connection reset")])
+    assert send_one(bot) == (1, 0)
+    assert bot.attempts == 3
+
+def test_permanent_errors_are_not_retried():
+    for error in (Forbidden("bot was blocked by the user"), BadRequest("chat not found")):
+        bot = FlakyBot([error])
+        assert send_one(bot) == (0, 1)
+        assert bot.attempts == 1
@@ -0,0 +1,58 @@
+from config.db import Base, engine, get_db
+from models.CacheEvent import CacheEvent
+from models.Wish import Wish
+from services.CacheSyncService import CacheSyncService
+from services.LRUCache import MISSING
+from services.UserService import UserService
+
+Base.metadata.create_all(bind=engine)
+
+def insert_event(event_id, key):
+    with get_db() as db:
+        db.add(CacheEvent(id=event_id, kind="user", key=key, origin="other-replica"))
+        db.commit()
+
+def test_late_commit_below_cursor_is_applied():
+    CacheSyncService.start_sync()
+    base = CacheSyncService._cursor
+    # Ids base+1 and base+2 were handed out in that order, but the second
+    # transaction committed first
+    insert_event(base + 2, 2)
+    assert CacheSyncService.apply_remote_events() == 1
+    assert base + 1 in CacheSyncService._gaps
+
+    UserService.user_cache.set(1, "stale")
+    insert_event(base + 1, 1)
+    assert CacheSyncService.apply_remote_events() == 1
+    assert UserService.user_cache.get(1) is MISSING
+    assert not CacheSyncService._gaps
+
+def test_gaps_expire(monkeypatch):
+    CacheSyncService.start_sync()
+    base = CacheSyncService._cursor
+    insert_event(base + 2, 2)
+    CacheSyncService.apply_remote_events()
+    monkeypatch.setattr(CacheSyncService, "gap_timeout", -1)
+    assert CacheSyncService.apply_remote_events() == 0
+    assert not CacheSyncService._gaps
+
+def test_remote_wish_changes_reach_search_index():
+    from services.WishesService import WishesService
+
+    user = UserService.get_or_create_user(555_000_100, "Remote")
+    WishesService.search("warm up")  # builds the index
+    CacheSyncService.start_sync()
+    with get_db() as db:
+        # Written by another replica: this process's index never saw it
+        db.add(Wish(user_id=user.id, text="Harmonica", priority=5, text_hash="remote"))
+        db.add(CacheEvent(kind="wishes", key=user.id, origin="other-replica"))
+        db.commit()
+    CacheSyncService.apply_remote_events()
+    assert [w.text for w in WishesService.search("harmonica")] == ["Harmonica"]
+
+    with get_db() as db:
+        db.query(Wish).filter(Wish.user_id == user.id).delete()
+        db.add(CacheEvent(kind="wishes", key=user.id, origin="other-replica"))
+        db.commit()
+    CacheSyncService.apply_remote_events()
+    assert WishesService.search("harmonica") == []
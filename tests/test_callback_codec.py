@@ -0,0 +1,98 @@
+import pytest
+from callback_codec import MAX_CALLBACK_DATA, SIGNATURE_SIZE, CallbackCodec, CallbackError
+
+SIGNED = 1
+UNSIGNED = 2
+codec = CallbackCodec(b"secret", signed={SIGNED})
+
+# Largest values the bot packs: 32-bit database ids, and Telegram ids,
+# which fit in 52 bits (negative for groups and channels)
+MAX_DB_ID = 2**31 - 1
+MAX_TELEGRAM_ID = 2**52
+
+def test_round_trip():
+    data = codec.encode(UNSIGNED, 1, 300, 70000)
+    assert codec.decode(data) == (UNSIGNED, [1, 300, 70000])
+
+def test_round_trip_without_args():
+    assert codec.decode(codec.encode(UNSIGNED)) == (UNSIGNED, [])
+
+def test_signed_round_trip():
+    data = codec.encode(SIGNED, 42, 7, signer=123456789)
+    assert codec.decode(data, signer=123456789) == (SIGNED, [42, 7])
+
+def test_negative_ids():
+    data = codec.encode(SIGNED, -1001234567890, -1, signer=-1009876543210)
+    assert codec.decode(data, signer=-1009876543210) == (SIGNED, [-1001234567890, -1])
+
+def test_data_is_url_safe_ascii():
+    data = codec.encode(SIGNED, MAX_DB_ID, MAX_DB_ID, signer=-MAX_TELEGRAM_ID)
+    assert data.isascii()
+    assert not set(data) & set("+/= ")
+
+def test_worst_case_signed_button_fits():
+    data = codec.encode(SIGNED, MAX_DB_ID, MAX_DB_ID, MAX_DB_ID, signer=-MAX_TELEGRAM_ID)
+    assert len(data) <= MAX_CALLBACK_DATA
+
+def test_bot_buttons_fit():
+    import bot
+
+    worst_args = {0: (), 1: (-MAX_TELEGRAM_ID,), 2: (MAX_DB_ID, MAX_DB_ID), 3: (MAX_DB_ID, MAX_DB_ID, MAX_DB_ID)}
+    for action, (_, nargs) in bot.CALLBACK_HANDLERS.items():
+        if action == bot.CB_PAGE:
+            values = (len(bot.ADMIN_VIEWS) - 1, bot.PAGE_PREV, MAX_DB_ID)
+        else:
+            values = worst_args[nargs]
+        data = bot.callbacks.encode(action, *values, signer=-MAX_TELEGRAM_ID)
+        assert len(data) <= MAX_CALLBACK_DATA, action
+        assert bot.callbacks.decode(data, signer=-MAX_TELEGRAM_ID) == (action, list(values))
+
+def test_over_limit_is_rejected():
+    with pytest.raises(ValueError):
+        codec.encode(UNSIGNED, *[MAX_TELEGRAM_ID] * 8)
+
+def test_signed_action_needs_signer():
+    with pytest.raises(ValueError):
+        codec.encode(SIGNED, 1)
+
+def test_wrong_signer():
+    data = codec.encode(SIGNED, 42, 7, signer=111)
+    with pytest.raises(CallbackError):
+        codec.decode(data, signer=222)
+    with pytest.raises(CallbackError):
+        codec.decode(data)
+
+def test_other_secret():
+    data = CallbackCodec(b"other", signed={SIGNED}).encode(SIGNED, 42, signer=111)
+    with pytest.raises(CallbackError):
+        codec.decode(data, signer=111)
+
+def _tamper(data: str, position: int):
+    replacement = "A" if data[position] != "A" else "B"
+    return data[:position] + replacement + data[position + 1:]
+
+def test_tampered_signature():
+    data = codec.encode(SIGNED, 42, 7, signer=111)
+    with pytest.raises(CallbackError):
+        codec.decode(_tamper(data, len(data) - 2), signer=111)
+
+def test_tampered_args():
+    data = codec.encode(SIGNED, 42, 7, signer=111)
+    with pytest.raises(CallbackError):
+        codec.decode(_tamper(data, 3), signer=111)
+
+@pytest.mark.parametrize("cut", [1, 4, SIGNATURE_SIZE, len(codec.encode(SIGNED, 42, 7, signer=111)) - 2])
+def test_truncated_signed_data(cut):
+    data = codec.encode(SIGNED, 42, 7, signer=111)
+    with pytest.raises(CallbackError):
+        codec.decode(data[:-cut], signer=111)
+
+def test_truncated_varint():
+    data = codec.encode(UNSIGNED, 300)
+    with pytest.raises(CallbackError):
+        codec.decode(data[:-1])
+
+@pytest.mark.parametrize("data", ["", "!!!", "delete_5", "AA", "Ag"])
+def test_garbage(data):
+    with pytest.raises(CallbackError):
+        codec.decode(data)
@@ -0,0 +1,30 @@
+import asyncio
+import gzip
+import bot
+
+class Message:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.texts = []
+        self.documents = []
+
+    async def edit_text(self, text):
+        self.texts.append(text)
+
+    async def reply_document(self, document, filename, reply_markup=None):
+        if self.fail:
+            raise ConnectionError("upload failed")
+        self.documents.append((filename, document.read()))
+
+def test_export_writes_gzipped_csv():
+    message = Message()
+    asyncio.run(bot._run_export(message, "csv", message))
+    filename, data = message.documents[0]
+    assert filename.endswith(".csv.gz")
+    assert gzip.decompress(data).decode().splitlines()[0] == ",".join(bot.EXPORT_FIELDS)
+    assert message.texts[-1].startswith("📦 Export finished")
+
+def test_failed_export_updates_status():
+    message = Message(fail=True)
+    asyncio.run(bot._run_export(message, "json", message))
+    assert message.texts == ["❌ Export failed, please try again."]
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERS, WISHES = 10, 3
+
+def test_workers_share_one_database(tmp_path):
+    # Three bot processes on one database, each update going to the next
+    # process in turn: every conversation step lands on a different replica
+    # than the one before, so registration and add-wish only complete if
+    # their state is shared through the database
+    url = f"sqlite:///{tmp_path}/workers.db"
+    env = dict(os.environ, DATABASE_URL=url)
+    subprocess.run(
+        [sys.executable, "loadtest.py", "--workers", "3",
+         "--users", str(USERS), "--wishes", str(WISHES), "--admins", "0"],
+        cwd=ROOT, env=env, check=True, timeout=300, stdout=subprocess.DEVNULL,
+    )
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        users = conn.execute(text("SELECT COUNT(*) FROM users")).scalar()
+        wishes = conn.execute(text("SELECT COUNT(*) FROM wishes")).scalar()
+        conversations = conn.execute(text("SELECT COUNT(*) FROM bot_state WHERE kind LIKE 'conversation:%'")).scalar()
+    engine.dispose()
+
+    assert users == USERS
+    # Every user adds WISHES wishes and then deletes one
+    assert wishes == USERS * (WISHES - 1)
+    # All conversations ended, so none is left half-way
+    assert conversations == 0
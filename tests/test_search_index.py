@@ -0,0 +1,74 @@
+import threading
+from types import SimpleNamespace
+from services.TrigramIndex import TrigramIndex
+
+def wish(wish_id, text, user_id=1):
+    return SimpleNamespace(id=wish_id, user_id=user_id, text=text)
+
+def built(*wishes):
+    index = TrigramIndex()
+    index.build(lambda: wishes)
+    return index
+
+def test_changes_before_first_build_are_ignored():
+    index = TrigramIndex()
+    index.add(wish(1, "Bike"))
+    assert not index.tracking
+    index.build(lambda: [])
+    assert index.search("bike") == []
+
+def test_changes_during_build_are_kept():
+    index = TrigramIndex()
+
+    def load():
+        # Rows the scan read before a concurrent create and delete landed
+        yield wish(1, "Red bike")
+        index.add(wish(3, "Blue bike"))
+        index.remove(1)
+        index.remove_user(2)
+        yield wish(1, "Red bike")
+        yield wish(2, "Green bike", user_id=2)
+
+    index.build(load)
+    assert [w.id for w in index.search("bike")] == [3]
+
+def test_failed_build_is_retried():
+    index = TrigramIndex()
+
+    def broken():
+        yield wish(1, "Bike")
+        raise ConnectionError("server closed the connection")
+
+    try:
+        index.build(broken)
+    except ConnectionError:
+        pass
+    assert not index.built and not index.tracking
+    index.build(lambda: [wish(2, "Bike")])
+    assert [w.id for w in index.search("bike")] == [2]
+
+def test_concurrent_first_searches_build_once():
+    index = TrigramIndex()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [wish(1, "Bike")]
+
+    threads = [threading.Thread(target=index.build, args=(load,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+
+def test_fuzzy_and_substring_matches():
+    index = built(wish(1, "Wireless headphones"), wish(2, "Silver necklace"), wish(3, "Teapot"))
+    assert [w.id for w in index.search("hedphones")] == [1]
+    assert [w.id for w in index.search("neck")] == [2]
+    assert [w.id for w in index.search("eckla")] == [2]
+
+def test_common_terms_score_a_bounded_sample():
+    index = built(*(wish(n, f"bike #{n}") for n in range(100)))
+    assert len(index.search("bike", limit=100, max_candidates=10)) == 10
+    assert len(index.search("bike", limit=100)) == 100
@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+import bot
+
+def wishes(count):
+    return [SimpleNamespace(id=n, user_id=1, priority=5, text=f"Wish_{n} with *stars*") for n in range(count)]
+
+def test_short_list_is_shared_whole():
+    text = bot._share_text("Ann_Lee", wishes(3))
+    assert text.startswith("🎁 *Ann\\_Lee's Wishlist*\n\n• \\[5] Wish\\_0 with \\*stars\\*")
+    assert "more" not in text
+
+def test_inline_snapshot_for_large_list_fits_telegram_limits():
+    user = SimpleNamespace(name="Ann", id=1)
+    entries = bot._build_inline_snapshot(user, wishes(1000), version=1)
+    assert len(entries) <= bot.INLINE_MAX_RESULTS
+    text = entries[0][1].input_message_content.message_text
+    assert bot._message_length(text) <= bot.MAX_MESSAGE_LENGTH
+    shown = text.count("\n• ")
+    assert 0 < shown < 1000
+    assert text.endswith(f"\n…and {1000 - shown} more")
@@ -0,0 +1,66 @@
+import asyncio
+import inspect
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from loadtest import message_update
+from update_processor import ChatUpdateProcessor
+
+def update(chat_id):
+    return Update.de_json(message_update(chat_id, "hi"), None)
+
+def test_base_class_still_uses_the_replaced_semaphore():
+    # ChatUpdateProcessor swaps out BaseUpdateProcessor._semaphore; if a
+    # python-telegram-bot upgrade stops using it here, revisit that
+    assert "async with self._semaphore:" in inspect.getsource(BaseUpdateProcessor.process_update)
+
+def test_busy_chat_does_not_block_other_chats():
+    async def main():
+        processor = ChatUpdateProcessor(2)
+        order = []
+        release = asyncio.Event()
+
+        async def handle(name):
+            order.append(f"{name} start")
+            if name.startswith("a"):
+                await release.wait()
+            order.append(f"{name} end")
+
+        busy = [asyncio.create_task(processor.process_update(update(1), handle(f"a{n}"))) for n in range(3)]
+        await asyncio.sleep(0)
+        await processor.process_update(update(2), handle("b"))
+        release.set()
+        await asyncio.gather(*busy)
+        return order
+
+    order = asyncio.run(main())
+    assert order.index("b end") < order.index("a0 end")
+    assert [item for item in order if item.startswith("a")] == [
+        "a0 start", "a0 end", "a1 start", "a1 end", "a2 start", "a2 end",
+    ]
+
+def test_cancelled_while_queued_keeps_counters_right():
+    async def main():
+        processor = ChatUpdateProcessor(1)
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+
+        async def never():
+            raise AssertionError("cancelled update ran")
+
+        running = asyncio.create_task(processor.process_update(update(1), hold()))
+        queued = [
+            asyncio.create_task(processor.process_update(update(1), never())),
+            asyncio.create_task(processor.process_update(object(), never())),
+        ]
+        await asyncio.sleep(0)
+        for task in queued:
+            task.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+        release.set()
+        await running
+        return processor.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["pending"], stats["in_flight"], stats["active_chats"]) == (0, 0, 0)
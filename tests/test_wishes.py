@@ -0,0 +1,14 @@
+from config.db import init_db
+from services.UserService import UserService
+from services.WishesService import WishesService
+
+init_db()
+
+def test_create_wish_reports_existing_duplicate():
+    user = UserService.get_or_create_user(555_000_001, "Dup")
+    wish, created = WishesService.create_wish(user.id, "Teapot", 3)
+    assert created and wish.priority == 3
+
+    again, created = WishesService.create_wish(user.id, "Teapot", 9)
+    assert not created
+    assert (again.id, again.priority) == (wish.id, 3)
@@ -0,0 +1,30 @@
+import asyncio
+import bot
+from config.db import init_db
+from services.UserService import UserService
+from services.WishesService import WishesService
+
+init_db()
+
+def test_large_wishlist_is_paged():
+    user = UserService.get_or_create_user(555_000_200, "Pages")
+    WishesService.create_wishes(user.id, [(f"Wish {n}", 5) for n in range(45)])
+
+    text, markup = asyncio.run(bot._render_wishlist(user.id, 555_000_200))
+    assert "(1–20)" in text
+    rows = markup.inline_keyboard
+    assert len(rows) == bot.WISHLIST_PAGE_SIZE + 1
+    assert [button.text for button in rows[-1]] == ["▶"]
+
+    text, markup = asyncio.run(bot._render_wishlist(user.id, 555_000_200, page=2))
+    assert "(41–45)" in text
+    assert [button.text for button in markup.inline_keyboard[-1]] == ["◀"]
+
+    # Past the end, e.g. after deleting the last wish of the last page
+    text, _ = asyncio.run(bot._render_wishlist(user.id, 555_000_200, page=3))
+    assert "(41–45)" in text
+
+def test_import_rejects_non_decimal_priority():
+    items, errors = bot._parse_import_rows([(1, "Bike", "²"), (2, "Book", "7")])
+    assert items == [("Book", 7)]
+    assert errors == ["line 1: priority must be 1–10"]
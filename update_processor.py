@@ -0,0 +1,115 @@
+import asyncio
+import sys
+import time
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Runs updates from different chats concurrently (up to max_concurrent_updates)
+# while keeping each chat's updates in order, so conversation states and delete
+# confirmations never race.
+class ChatUpdateProcessor(BaseUpdateProcessor):
+
+    def __init__(self, max_concurrent_updates: int, before_update=None, after_update=None):
+        super().__init__(max_concurrent_updates)
+        # Optional coroutine functions run with the chat lock held, before
+        # and after the update
+        self.before_update = before_update
+        self.after_update = after_update
+        # The base semaphore is acquired before we know the chat; make it
+        # unbounded and apply the real limit once the chat lock is held, so
+        # a busy chat's backlog doesn't occupy slots other chats could use.
+        # _semaphore is private to python-telegram-bot: this relies on 20.6's
+        # process_update acquiring it around do_process_update, which
+        # tests/test_update_processor.py checks.
+        self._semaphore = asyncio.BoundedSemaphore(sys.maxsize)
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._chat_locks = {}
+        self._chat_waiters = {}
+        self.pending = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @staticmethod
+    def _chat_key(update):
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return ("user", update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self._chat_key(update)
+        queued_at = time.monotonic()
+        self.pending += 1
+        queued = True
+        if key is None:
+            try:
+                async with self._slots:
+                    queued = False
+                    self._started(queued_at)
+                    try:
+                        await coroutine
+                    finally:
+                        self.in_flight -= 1
+            finally:
+                if queued:
+                    # Cancelled while waiting for a slot
+                    self.pending -= 1
+                    coroutine.close()
+            return
+
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        try:
+            async with lock, self._slots:
+                queued = False
+                self._started(queued_at)
+                try:
+                    if self.before_update is not None:
+                        try:
+                            await self.before_update(update)
+                        except BaseException:
+                            coroutine.close()
+                            raise
+                    try:
+                        await coroutine
+                    finally:
+                        if self.after_update is not None:
+                            await self.after_update(update)
+                finally:
+                    self.in_flight -= 1
+        finally:
+            if queued:
+                self.pending -= 1
+                coroutine.close()
+            self._chat_waiters[key] -= 1
+            if not self._chat_waiters[key]:
+                del self._chat_waiters[key]
+                del self._chat_locks[key]
+
+    def _started(self, queued_at: float):
+        wait = time.monotonic() - queued_at
+        self.pending -= 1
+        self.in_flight += 1
+        self.processed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "active_chats": len(self._chat_locks),
+            "processed": self.processed,
+            "avg_wait": self.total_wait / self.processed if self.processed else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass